@@ -2,4 +2,5 @@
 set -euo pipefail
 # cd to src foler first
 cd src
-uvicorn spec.api.server:app --host 0.0.0.0 --port "${PORT:-9000}"
\ No newline at end of file
+# One worker: result pages, artifacts and notebook kernels live in the server process
+uvicorn spec.api.server:app --host 0.0.0.0 --port "${PORT:-9000}" --workers 1
\ No newline at end of file
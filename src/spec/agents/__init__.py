@@ -5,6 +5,9 @@ from spec.agents.prompts import (BOM_AGENT_PROMPT, SPECBOOK_AGENT_PROMPT,
                                  TRIAGE_AGENT_PROMPT)
 from spec.config import *
 from spec.models import AgentName
+from spec.tools.bom import (compare_boms, count_parts, get_child_parts,
+                            get_descendant_parts, get_software_parts,
+                            get_where_used, query_bom_sql, search_part_ids)
 from spec.tools.python_exec import code_interpreter
 from spec.tools.specbook import (
     get_relevant_specbook_content_by_query_partial_context,
@@ -25,8 +28,16 @@ specbook_agent = Agent(
 bom_agent = Agent(
     name=AgentName.BOM_AGENT.value,
     instructions=f"{RECOMMENDED_PROMPT_PREFIX}\n---\n{BOM_AGENT_PROMPT}",
-    handoff_description=f"A {AgentName.BOM_AGENT.value} capable of writing Python code (pandas, matplotlib, etc...) to analyze BOM data (available in the context), visualize charts and provide detailed, accurate responses",
+    handoff_description=f"A {AgentName.BOM_AGENT.value} capable of querying the BOM hierarchy and writing Python code (pandas, matplotlib, etc...) to analyze BOM data (available in the context), visualize charts and provide detailed, accurate responses",
     tools=[
+        search_part_ids,
+        get_child_parts,
+        get_descendant_parts,
+        get_where_used,
+        count_parts,
+        get_software_parts,
+        compare_boms,
+        *([query_bom_sql] if settings.bom_sql_enabled else []),
         code_interpreter
     ],
     model="gpt-4.1"
@@ -0,0 +1,164 @@
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import Agent, RunContextWrapper, RunHooks
+
+from spec.utils.metrics import agent_seconds, llm_seconds, llm_tokens_total, tool_seconds
+from spec.utils.tracing import Span, tracer
+
+
+class MetricsHooks(RunHooks):
+    """
+    Records the agent, tool and LLM call latencies of runs, and the tokens
+    used by each model, in `spec.utils.metrics`.
+
+    One instance serves every run: starts are keyed by the run's user
+    context (the SDK passes a new wrapper object to every agent and tool hook,
+    but they all wrap the same context), and parallel calls of the same tool
+    are matched first-in, first-out.
+    """
+
+    def __init__(self):
+        self._starts: Dict[Tuple[int, str, str], List[float]] = defaultdict(list)
+
+    def _start(self, context: RunContextWrapper, kind: str, name: str) -> None:
+        self._starts[(id(context.context), kind, name)].append(time.perf_counter())
+
+    def _elapsed(self, context: RunContextWrapper, kind: str, name: str) -> float | None:
+        key = (id(context.context), kind, name)
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        start = starts.pop(0)
+        if not starts:
+            del self._starts[key]
+        return time.perf_counter() - start
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent) -> None:
+        self._start(context, "agent", agent.name)
+
+    async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: Any) -> None:
+        elapsed = self._elapsed(context, "agent", agent.name)
+        if elapsed is not None:
+            agent_seconds.observe(elapsed, agent=agent.name)
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent) -> None:
+        # The agent handing off is done; `on_agent_end` only fires for the last agent
+        await self.on_agent_end(context, from_agent, None)
+
+    async def on_tool_start(self, context: RunContextWrapper, agent: Agent, tool) -> None:
+        self._start(context, "tool", tool.name)
+
+    async def on_tool_end(self, context: RunContextWrapper, agent: Agent, tool, result: Any) -> None:
+        elapsed = self._elapsed(context, "tool", tool.name)
+        if elapsed is not None:
+            tool_seconds.observe(elapsed, tool=tool.name)
+
+    # Called by SDK versions with LLM hooks
+    async def on_llm_start(self, context: RunContextWrapper, agent: Agent, *args: Any) -> None:
+        self._start(context, "llm", agent.name)
+
+    async def on_llm_end(self, context: RunContextWrapper, agent: Agent, response: Any) -> None:
+        model = str(agent.model)
+        elapsed = self._elapsed(context, "llm", agent.name)
+        if elapsed is not None:
+            llm_seconds.observe(elapsed, model=model, source="agent")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            llm_tokens_total.inc(usage.input_tokens, model=model, source="agent", direction="input")
+            llm_tokens_total.inc(usage.output_tokens, model=model, source="agent", direction="output")
+
+    def discard(self, context: RunContextWrapper, error: Optional[BaseException] = None) -> None:
+        """Forget the unfinished calls of a run that ended (e.g. cancelled)."""
+        for key in [k for k in self._starts if k[0] == id(context.context)]:
+            del self._starts[key]
+
+
+class TracingHooks(RunHooks):
+    """
+    Agent, handoff and LLM call spans of runs, in `spec.utils.tracing`.
+
+    Hooks run in tasks of their own, so they cannot change the current span:
+    agent spans are parented to the span current when the run started (the
+    request span) and bound to the run's user context, where `@traced` tools
+    find the span to nest under.
+    """
+
+    def __init__(self):
+        self._llm: Dict[int, Span] = {}
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent) -> None:
+        tracer.bind(context.context, tracer.start(f"agent.{agent.name}", kind="agent", agent=agent.name))
+
+    async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: Any) -> None:
+        tracer.end(tracer.unbind(context.context))
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent) -> None:
+        parent = tracer.unbind(context.context)
+        tracer.end(tracer.start("handoff", kind="handoff", parent=parent, to_agent=to_agent.name))
+        tracer.end(parent)
+
+    async def on_llm_start(self, context: RunContextWrapper, agent: Agent, *args: Any) -> None:
+        span = tracer.start(
+            "llm", kind="llm", parent=tracer.bound(context.context), model=str(agent.model), source="agent"
+        )
+        if span is not None:
+            self._llm[id(context.context)] = span
+
+    async def on_llm_end(self, context: RunContextWrapper, agent: Agent, response: Any) -> None:
+        span = self._llm.pop(id(context.context), None)
+        usage = getattr(response, "usage", None)
+        if span is not None and usage is not None:
+            span.attributes.update(input_tokens=usage.input_tokens, output_tokens=usage.output_tokens)
+        tracer.end(span)
+
+    def discard(self, context: RunContextWrapper, error: Optional[BaseException] = None) -> None:
+        """End the spans a run left open (e.g. cancelled, or failed with *error*)."""
+        tracer.end(self._llm.pop(id(context.context), None), error=error)
+        tracer.end(tracer.unbind(context.context), error=error)
+
+
+class CompositeHooks(RunHooks):
+    """Several `RunHooks` for one run, called in order."""
+
+    def __init__(self, *hooks: RunHooks):
+        self.hooks = hooks
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent) -> None:
+        for hooks in self.hooks:
+            await hooks.on_agent_start(context, agent)
+
+    async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: Any) -> None:
+        for hooks in self.hooks:
+            await hooks.on_agent_end(context, agent, output)
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent) -> None:
+        for hooks in self.hooks:
+            await hooks.on_handoff(context, from_agent, to_agent)
+
+    async def on_tool_start(self, context: RunContextWrapper, agent: Agent, tool) -> None:
+        for hooks in self.hooks:
+            await hooks.on_tool_start(context, agent, tool)
+
+    async def on_tool_end(self, context: RunContextWrapper, agent: Agent, tool, result: Any) -> None:
+        for hooks in self.hooks:
+            await hooks.on_tool_end(context, agent, tool, result)
+
+    async def on_llm_start(self, context: RunContextWrapper, agent: Agent, *args: Any) -> None:
+        for hooks in self.hooks:
+            await hooks.on_llm_start(context, agent, *args)
+
+    async def on_llm_end(self, context: RunContextWrapper, agent: Agent, response: Any) -> None:
+        for hooks in self.hooks:
+            await hooks.on_llm_end(context, agent, response)
+
+    def discard(self, context: RunContextWrapper, error: Optional[BaseException] = None) -> None:
+        for hooks in self.hooks:
+            if hasattr(hooks, "discard"):
+                hooks.discard(context, error=error)
+
+
+metrics_hooks = MetricsHooks()
+tracing_hooks = TracingHooks()
+run_hooks = CompositeHooks(metrics_hooks, tracing_hooks)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+__all__ = ["AdmissionController", "QueueFull", "Ticket"]
+
+
+class QueueFull(Exception):
+    """The request can neither run nor wait: the global or the user's queue is full."""
+
+
+class Ticket:
+    """One chat request's place in the `AdmissionController`."""
+
+    __slots__ = ("user", "granted", "released", "_future", "_changed")
+
+    def __init__(self, user: str):
+        self.user = user
+        self.granted = False
+        self.released = False
+        self._future: Optional[asyncio.Future] = None
+        self._changed = asyncio.Event()
+
+
+class AdmissionController:
+    """
+    Decides when a chat request may start its agent run.
+
+        • at most `max_in_flight` runs at once, and `per_user` per user
+        • requests beyond that wait in a fair queue: users take turns
+          (round robin), so one user's backlog never delays another user by
+          more than one run per turn
+        • at most `max_queue` waiting requests in total and `per_user_queue`
+          per user; beyond that `enter()` raises `QueueFull` (HTTP 429)
+        • waiting requests are told their position whenever it changes
+
+    Usage:
+        admission = AdmissionController(max_in_flight=32, per_user=2)
+        ticket = admission.enter(username)  # may raise QueueFull
+        try:
+            await admission.wait(ticket, report=lambda position: ...)
+            ...  # run
+        finally:
+            admission.release(ticket)
+    """
+
+    def __init__(self, max_in_flight: int = 32, per_user: int = 2, max_queue: int = 256, per_user_queue: int = 8):
+        self.max_in_flight = max_in_flight
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self.per_user_queue = per_user_queue
+
+        self._running: Dict[str, int] = {}
+        self._in_flight = 0
+        # user -> waiting tickets; the order of the users is the round-robin order
+        self._queues: OrderedDict[str, Deque[Ticket]] = OrderedDict()
+        self._queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    # ───────────────────────────── public API ─────────────────────────────────
+    def enter(self, user: str) -> Ticket:
+        """A ticket that is either granted right away or queued; raises `QueueFull`."""
+        ticket = Ticket(user)
+        # Waiting tickets are blocked by the global cap or their own user's cap, so a user
+        # with room does not overtake anyone
+        if self._has_room(user):
+            self._grant(ticket)
+            return ticket
+        queue = self._queues.get(user)
+        if self._queued >= self.max_queue or (queue is not None and len(queue) >= self.per_user_queue):
+            self.rejected += 1
+            raise QueueFull(f"Too many pending requests for '{user}'" if queue else "The server is busy")
+        ticket._future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(ticket)
+        self._queued += 1
+        self._notify()
+        return ticket
+
+    async def wait(self, ticket: Ticket, report: Optional[Callable[[int], Awaitable[None]]] = None) -> None:
+        """Until *ticket* is granted, reporting its 1-based queue position when it changes."""
+        last = None
+        while not ticket.granted:
+            ticket._changed.clear()
+            if report is not None:
+                position = self.position(ticket)
+                if position != last:
+                    last = position
+                    await report(position)
+                    continue  # the queue may have moved while reporting
+            changed = asyncio.ensure_future(ticket._changed.wait())
+            try:
+                await asyncio.wait({ticket._future, changed}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+
+    def release(self, ticket: Ticket) -> None:
+        """The run ended, or the request gave up waiting. Safe to call more than once."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self._in_flight -= 1
+            self._running[ticket.user] -= 1
+            if not self._running[ticket.user]:
+                del self._running[ticket.user]
+        else:
+            queue = self._queues.get(ticket.user)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[ticket.user]
+        self._schedule()
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place of a waiting ticket in the round-robin order, 0 once granted."""
+        if ticket.granted:
+            return 0
+        queue = self._queues.get(ticket.user)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        ahead, before = index, True
+        for user, other in self._queues.items():
+            if user == ticket.user:
+                before = False
+                continue
+            # Users before ours in the rotation are served once more in our round
+            ahead += min(len(other), index + (1 if before else 0))
+        return ahead + 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "users_running": len(self._running),
+            "users_waiting": len(self._queues),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _has_room(self, user: str) -> bool:
+        return self._in_flight < self.max_in_flight and self._running.get(user, 0) < self.per_user
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted = True
+        self._in_flight += 1
+        self._running[ticket.user] = self._running.get(ticket.user, 0) + 1
+        self.admitted += 1
+        if ticket._future is not None and not ticket._future.done():
+            ticket._future.set_result(None)
+
+    def _schedule(self) -> None:
+        """Grant waiting tickets in round-robin order while there is room."""
+        progressed = True
+        while progressed and self._queued and self._in_flight < self.max_in_flight:
+            progressed = False
+            for user in list(self._queues):
+                if not self._has_room(user):
+                    continue
+                queue = self._queues.pop(user)
+                ticket = queue.popleft()
+                self._queued -= 1
+                if queue:
+                    self._queues[user] = queue  # back of the rotation
+                self._grant(ticket)
+                progressed = True
+                break
+        self._notify()
+
+    def _notify(self) -> None:
+        for queue in self._queues.values():
+            for ticket in queue:
+                ticket._changed.set()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from base64 import b64encode
+from typing import Any, Callable, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: `pip install spec[stream]`
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional: `pip install spec[stream]`
+    zstandard = None
+
+__all__ = [
+    "FramedCodec",
+    "NDJSONCodec",
+    "StreamCompressor",
+    "get_dumps",
+    "negotiate_codec",
+    "negotiate_encoding",
+]
+
+NDJSON = "application/x-ndjson"
+FRAMED = "application/vnd.spec.frames"
+
+Frame = dict
+Dumps = Callable[[Any], bytes]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def get_dumps(name: str = "auto") -> Dumps:
+    """The frame header serializer: "orjson", "json", or "auto" (orjson when installed)."""
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name == "orjson":
+        if orjson is None:
+            raise ImportError("The 'orjson' serializer requires the `orjson` package")
+        return _orjson_dumps
+    if name == "json":
+        return _json_dumps
+    raise ValueError(f"Unknown serializer '{name}', use 'auto', 'orjson' or 'json'")
+
+
+# ─── Codecs: frame dicts → bytes ──────────────────────────────────────────────
+# A frame is a JSON-able dict; binary content (Arrow IPC, images) is kept raw
+# under "payload" until the codec decides how to put it on the wire.
+
+
+class NDJSONCodec:
+    """One JSON object per line; a payload is sent base64-encoded as "b64"."""
+
+    media_type = NDJSON
+
+    def __init__(self, dumps: Dumps = _json_dumps):
+        self.dumps = dumps
+
+    def encode(self, frame: Frame) -> bytes:
+        payload = frame.get("payload")
+        if payload is not None:
+            frame = {k: v for k, v in frame.items() if k != "payload"}
+            frame["b64"] = b64encode(payload).decode()
+        return self.dumps(frame) + b"\n"
+
+    def encode_many(self, frames: Iterable[Frame]) -> bytes:
+        return b"".join(map(self.encode, frames))
+
+
+class FramedCodec:
+    """
+    Length-prefixed binary frames, payloads sent as raw bytes:
+
+        [u32 header length][header JSON][u32 payload length][payload]
+
+    Lengths are big-endian; the payload length is 0 for text frames.
+    """
+
+    media_type = FRAMED
+
+    def __init__(self, dumps: Dumps = _json_dumps):
+        self.dumps = dumps
+
+    def encode(self, frame: Frame) -> bytes:
+        payload = frame.get("payload") or b""
+        header = self.dumps({k: v for k, v in frame.items() if k != "payload"})
+        return b"".join((struct.pack(">I", len(header)), header, struct.pack(">I", len(payload)), payload))
+
+    def encode_many(self, frames: Iterable[Frame]) -> bytes:
+        return b"".join(map(self.encode, frames))
+
+
+def negotiate_codec(accept: Optional[str], dumps: Dumps) -> NDJSONCodec | FramedCodec:
+    """Binary frames if the client lists them in `Accept`, NDJSON otherwise."""
+    if accept and FRAMED in accept:
+        return FramedCodec(dumps)
+    return NDJSONCodec(dumps)
+
+
+# ─── Compression ──────────────────────────────────────────────────────────────
+
+
+def negotiate_encoding(accept_encoding: Optional[str], allowed: Iterable[str] = ("zstd", "gzip")) -> Optional[str]:
+    """The first of *allowed* that the client accepts (q > 0) and that is available here."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in allowed:
+        if encoding == "zstd" and zstandard is None:
+            continue
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class StreamCompressor:
+    """
+    Incremental gzip/zstd compression of a streamed response.
+
+    Every chunk is flushed on its own, so the client can decode each frame
+    as soon as it arrives; the dictionary is kept across chunks, which is
+    where the repeated frame headers compress well.
+    """
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+        else:
+            raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.compress(chunk) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        return self._obj.compress(chunk) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
@@ -1,40 +1,52 @@
 import asyncio
-import io
-import json
-from base64 import b64encode
 from datetime import datetime
-from typing import Any, AsyncIterator, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import pandas as pd
 import pyarrow as pa
 import pytz
 from matplotlib.figure import Figure
 from PIL import Image
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from spec.api.framing import FramedCodec, NDJSONCodec
 from spec.models import Buffer
+from spec.utils.artifacts import ARROW_STREAM, ArtifactStore
+from spec.utils.charts import RenderedChart, chart_renderer
+from spec.utils.results import ResultStore
 
 
-def _b64(data: bytes) -> str:
-    return b64encode(data).decode()
+_PAYLOAD_MIME = {"bytes": "application/octet-stream", "dataframe_arrow": ARROW_STREAM, "dataframe_page": ARROW_STREAM}
 
-def _ser(obj: Any) -> dict:
+def _ser(obj: Any, artifacts: Optional[ArtifactStore] = None) -> Optional[dict]:
+    """
+    The frame of *obj*; binary content goes raw under "payload", the codec decides how to send it.
+    With an artifact store, the content is stored there and the frame only references it.
+    """
     try:
         if isinstance(obj, str):
             return {"kind": "text", "data": obj}
         if isinstance(obj, bytes):
-            return {"kind": "bytes", "b64": _b64(obj)}
-        if isinstance(obj, pd.DataFrame):
+            frame = {"kind": "bytes", "payload": obj}
+        elif isinstance(obj, pd.DataFrame):
             buf = pa.ipc.serialize_pandas(obj)
-            return {"kind": "dataframe_arrow", "b64": _b64(buf)}
-        if isinstance(obj, Image.Image):
-            buf = io.BytesIO(); obj.save(buf, format="PNG")
-            return {"kind": "image/png", "b64": _b64(buf.getvalue())}
-        if isinstance(obj, Figure):
-            buf = io.BytesIO(); obj.savefig(buf, format="png", bbox_inches="tight")
-            return {"kind": "image/png", "b64": _b64(buf.getvalue())}
+            frame = {"kind": "dataframe_arrow", "payload": buf.to_pybytes()}
+        else:
+            if isinstance(obj, (Image.Image, Figure)):
+                obj = chart_renderer.render(obj)
+            if not isinstance(obj, RenderedChart):
+                return None
+            frame = {"kind": obj.mime, "payload": obj.data}
     except Exception as e:
-        raise ValueError(f"Cannot serialize object: {e}")    
+        raise ValueError(f"Cannot serialize object: {e}")
+    return _as_artifact(frame, artifacts) if artifacts is not None else frame
+
+def _as_artifact(frame: dict, artifacts: ArtifactStore) -> dict:
+    artifact = artifacts.put(frame["payload"], _PAYLOAD_MIME.get(frame["kind"], frame["kind"]))
+    if frame["kind"] == "dataframe_page":
+        # The handle stays in the frame, only its first page becomes an artifact
+        return {**{k: v for k, v in frame.items() if k != "payload"}, "artifact": artifact.to_dict()}
+    return artifact.to_dict()
 
 class Message(BaseModel):
     role: str
@@ -43,8 +55,11 @@ class Message(BaseModel):
 class Session(BaseModel):
     id: str
     username: str
-    messages: List[Message] = []
-    init_time: str = datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).strftime("%Y%m%d_%H%M%S")
+    # Agent input items (`RunResult.to_input_list()`): messages, tool calls and tool outputs
+    messages: List[Dict[str, Any]] = []
+    init_time: str = Field(
+        default_factory=lambda: datetime.now(pytz.timezone("Asia/Ho_Chi_Minh")).strftime("%Y%m%d_%H%M%S")
+    )
 
 # ────── API payloads ───────────────────────────────────────────
 class CreateSessionRequest(BaseModel):
@@ -58,20 +73,140 @@ class ChatRequest(BaseModel):
     message: str
 
 class SerializedStreamBuffer(Buffer):
-    def __init__(self):
+    """
+    Frames of one chat response, encoded by `codec` (NDJSON by default, or
+    length-prefixed binary frames, see `spec.api.framing`).
+
+        • bounded: at most `maxsize` frames wait for the client; beyond that
+          `write()` blocks, so a slow client slows the agent run down instead
+          of growing the server's memory
+        • consecutive text deltas are merged into one `text` frame, flushed
+          `coalesce_ms` after the first pending delta or once
+          `coalesce_chars` characters are pending, whichever comes first
+        • frames already waiting are sent to the client in one chunk
+        • with an `artifacts` store, charts and tables are sent as
+          `{"kind": "artifact", "id", "mime"}` references, fetched (and
+          cached by the client) from `GET /artifacts/{id}`
+        • `abort()` (client gone) drops pending frames; later writes are
+          discarded instead of waiting for a reader that will never come
+    """
+
+    def __init__(
+        self,
+        results: Optional[ResultStore] = None,
+        maxsize: int = 64,
+        coalesce_ms: float = 30.0,
+        coalesce_chars: int = 2048,
+        codec: Optional[NDJSONCodec | FramedCodec] = None,
+        artifacts: Optional[ArtifactStore] = None,
+    ):
         super().__init__()
-        self._queue: asyncio.Queue = asyncio.Queue()
+        self.codec = codec or NDJSONCodec()
+        self._artifacts = artifacts
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._results = results
+        self.coalesce_window = coalesce_ms / 1000
+        self.coalesce_chars = coalesce_chars
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._aborted = False
+        # The stream reached its end marker
+        self.drained = False
+        # Keeps frames in order while several writers wait for room in the queue
+        self._put_lock = asyncio.Lock()
 
     async def write(self, obj: Any):
-        await self._queue.put(_ser(obj))
+        if isinstance(obj, str):
+            await self._write_text(obj)
+            return
+        if isinstance(obj, (Image.Image, Figure)):
+            # Rendered off the event loop; the frame is queued once it is encoded
+            obj = await chart_renderer.arender(obj)
+        if isinstance(obj, pd.Series):
+            obj = obj.to_frame()
+        if isinstance(obj, pd.DataFrame) and self._results is not None and len(obj) > self._results.page_size:
+            frame = await asyncio.to_thread(self._paged, obj)
+        elif self._artifacts is not None:
+            # Hashing (and possibly spilling) the content stays off the event loop
+            frame = await asyncio.to_thread(_ser, obj, self._artifacts)
+        else:
+            frame = _ser(obj)
+        if frame is None:
+            # Not a streamable type; None would end the stream
+            return
+        await self._flush()
+        await self._put(frame)
+
+    async def write_frame(self, frame: dict):
+        """Queue a status frame (e.g. the queue position) as is, after any pending text."""
+        await self._flush()
+        await self._put(frame)
+
+    def _paged(self, df: pd.DataFrame) -> Optional[dict]:
+        """First page inline plus a handle; the client fetches the rest from `GET /results/{id}`."""
+        handle = self._results.put(df)
+        first = self._results.page(handle.id, 0) if handle is not None else None
+        if first is None:
+            # Too large for the result store: send the first page only, marked as truncated
+            frame = _ser(df.head(self._results.page_size), self._artifacts)
+            return {**frame, "rows": len(df), "truncated": True} if frame is not None else None
+        frame = {"kind": "dataframe_page", **handle.to_dict(), "page": 0, "payload": first}
+        return _as_artifact(frame, self._artifacts) if self._artifacts is not None else frame
 
     async def close(self):
-        await self._queue.put(None)
+        await self._flush()
+        await self._put(None)
 
-    async def stream(self) -> AsyncIterator[str]:
+    def abort(self):
+        """Stop buffering for a client that disconnected."""
+        self._aborted = True
+        self._pending.clear()
+        self._pending_chars = 0
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def stream(self) -> AsyncIterator[bytes]:
         while True:
-            item = await self._queue.get()
-            if item is None:
+            items = [await self._queue.get()]
+            while items[-1] is not None and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            done = items[-1] is None
+            if done:
+                items.pop()
+            if items:
+                yield self.codec.encode_many(items)
+            if done:
+                self.drained = True
                 break
-            yield json.dumps(item, separators=(",", ":")) + "\n"
-            
\ No newline at end of file
+
+    # ───────────────────────────── implementation details ─────────────────────
+    async def _write_text(self, text: str):
+        if not text or self._aborted:
+            return
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self.coalesce_chars:
+            await self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.coalesce_window)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        await self._put({"kind": "text", "data": text})
+
+    async def _put(self, frame: Optional[dict]):
+        if self._aborted:
+            return
+        async with self._put_lock:
+            await self._queue.put(frame)
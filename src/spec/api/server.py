@@ -2,79 +2,318 @@ from __future__ import annotations
 
 import asyncio
 import os
-from typing import Dict
+import time
+from functools import partial
+from typing import AsyncIterator, Optional, Set
 from uuid import uuid4
 
 from agents import Runner
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from openai.types.responses import ResponseTextDeltaEvent
 
 from spec.agents import triage_agent
+from spec.agents.hooks import run_hooks
+from spec.api.admission import AdmissionController, QueueFull, Ticket
+from spec.api.framing import (StreamCompressor, get_dumps, negotiate_codec,
+                              negotiate_encoding)
 from spec.api.schema import (ChatRequest, CreateSessionRequest,
                              CreateSessionResponse, SerializedStreamBuffer,
                              Session)
-from spec.config import settings
+from spec.api.sessions import build_session_store
+from spec.cache import kernel_pool
+from spec.config import logger, settings
 from spec.models import ContextHook
-from spec.utils.utils import save_messages
+from spec.utils import metrics
+from spec.utils.artifacts import ArtifactStore
+from spec.utils.conversation_log import get_conversation_log
+from spec.utils.history import history_manager
+from spec.utils.results import ResultStore
+from spec.utils.tracing import tracer
 
 app = FastAPI()
-_sessions: Dict[str, Session] = {}
+_sessions = build_session_store()
+_results = ResultStore(page_size=settings.result_page_rows, max_bytes=settings.result_store_mb * 1024**2)
+_artifacts = (
+    ArtifactStore(
+        max_memory_bytes=settings.artifact_memory_mb * 1024**2,
+        spill_dir=settings.artifact_dir or None,
+        max_disk_bytes=settings.artifact_disk_mb * 1024**2,
+    )
+    if settings.stream_artifacts
+    else None
+)
+# Agent runs in flight; holding them here also keeps them from being garbage-collected mid-run
+_runs: Set[asyncio.Task] = set()
+_admission = AdmissionController(
+    max_in_flight=settings.admission_max_in_flight,
+    per_user=settings.admission_per_user,
+    max_queue=settings.admission_max_queue,
+    per_user_queue=settings.admission_per_user_queue,
+)
+_dumps = get_dumps(settings.stream_serializer)
+
+
+@app.on_event("startup")
+async def startup():
+    if kernel_pool is not None:
+        # Zygote and prewarmed kernels are built in the background, not at import
+        kernel_pool.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in _runs:
+        task.cancel()
+    await asyncio.gather(*_runs, return_exceptions=True)
+    _sessions.close()
+    if get_conversation_log.cache_info().currsize:
+        await asyncio.to_thread(get_conversation_log().close)
+    await asyncio.to_thread(tracer.close)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the path: ids in paths would make a series per request
+        route = request.scope.get("route")
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
 
 
 # ───── 1. New chat ─────────────────────────────────────────────
 @app.post("/sessions", response_model=CreateSessionResponse, status_code=201)
 async def create_session(req: CreateSessionRequest):
     session_id = str(uuid4())
-    _sessions[session_id] = Session(id=session_id, username=req.username)
+    await _sessions.aput(Session(id=session_id, username=req.username))
     return {"session_id": session_id}
 
-async def run_chat_stream(session: Session, req: ChatRequest, buffer: SerializedStreamBuffer, hook: ContextHook):
+async def run_chat_stream(
+    session: Session,
+    req: ChatRequest,
+    buffer: SerializedStreamBuffer,
+    hook: ContextHook,
+    ticket: Ticket,
+    received: float,
+    trace_id: str,
+):
+    with tracer.span("chat", kind="request", trace_id=trace_id, session_id=session.id, user=session.username):
+        await _run_chat_stream(session, req, buffer, hook, ticket, received)
+
+async def _run_chat_stream(
+    session: Session,
+    req: ChatRequest,
+    buffer: SerializedStreamBuffer,
+    hook: ContextHook,
+    ticket: Ticket,
+    received: float,
+):
+    result = admitted = error = None
+    status = "error"
+    agent_input = history_manager.agent_input(session.messages, req.message)
     try:
+        # Queued behind other runs: the client sees its place in the queue until the run starts
+        with tracer.span("admission", kind="queue"):
+            await _admission.wait(ticket, report=lambda position: buffer.write_frame({"kind": "queue", "position": position}))
+        admitted = time.perf_counter()
+        metrics.chat_queue_seconds.observe(admitted - received)
+
+        # Started inside the request span: the run's task, and so its tools, inherit it as the current span
         result = Runner.run_streamed(
             starting_agent=triage_agent,
-            input=session.messages + [{"role": "user", "content": req.message}],
+            input=agent_input,
             context=hook,
+            hooks=run_hooks,
         )
         
+        first_token = True
         async for ev in result.stream_events():
             if ev.type == "raw_response_event" and isinstance(ev.data, ResponseTextDeltaEvent):
+                if first_token:
+                    first_token = False
+                    metrics.chat_ttft_seconds.observe(time.perf_counter() - received)
                 await buffer.write(ev.data.delta)
-                
+        status = "ok"
+
+    except asyncio.CancelledError as e:
+        # The client went away: stop the agent loop, which cancels the tool calls in flight
+        # (specbook fan-out, notebook cells) and any further LLM requests
+        status, error = "cancelled", e
+        logger.info(f"Chat run of session {session.id} cancelled")
+        if result is not None:
+            result.cancel()
+        buffer.abort()
+        raise
+    except Exception as e:
+        error = e
+        raise
     finally:
+        if admitted is not None:
+            metrics.chat_run_seconds.observe(time.perf_counter() - admitted, status=status)
+        if result is not None:
+            run_hooks.discard(result.context_wrapper, error=error)
+        _admission.release(ticket)
         await buffer.close()
 
-    session.messages = result.to_input_list()
-    
-    await asyncio.to_thread(
-        save_messages,
-        session.messages,
-        folder=f"{settings.s3_folder}/{session.username}/logs",
-        filename=f"{session.init_time}.json",
+    # The user message and the items the run added; the run saw a compacted history, the session keeps it all
+    turn = result.to_input_list()[len(agent_input) - 1:]
+    session.messages = session.messages + turn
+    await _sessions.aput(session)
+
+    # Only this turn is logged
+    get_conversation_log().append(
+        f"{settings.s3_folder}/{session.username}/logs/{session.init_time}_{session.id}",
+        turn,
     )
 
 @app.post("/chat/stream")
-async def stream_messages(req: ChatRequest):
-    session = _sessions.get(req.session_id)
+async def stream_messages(req: ChatRequest, request: Request):
+    session = await _sessions.aget(req.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Invalid session")
+
+    received = time.perf_counter()
+    try:
+        ticket = _admission.enter(session.username)
+    except QueueFull as e:
+        metrics.chat_rejected_total.inc()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(settings.admission_retry_after)})
  
-    buffer = SerializedStreamBuffer()
-    hook   = ContextHook(buffer)
+    buffer = SerializedStreamBuffer(
+        results=_results,
+        maxsize=settings.stream_queue_size,
+        coalesce_ms=settings.stream_coalesce_ms,
+        coalesce_chars=settings.stream_coalesce_chars,
+        codec=negotiate_codec(request.headers.get("accept"), _dumps),
+        artifacts=_artifacts,
+    )
+    hook   = ContextHook(buffer, session_id=session.id)
+
+    trace_id = tracer.new_trace_id()
+    task = asyncio.create_task(run_chat_stream(session, req, buffer, hook, ticket, received, trace_id))
+    _runs.add(task)
+    task.add_done_callback(_runs.discard)
+    # The run's own finally does not execute if it is cancelled before its first step
+    task.add_done_callback(partial(_end_run, ticket, buffer))
+
+    headers = {"Vary": "Accept, Accept-Encoding", "X-Trace-Id": trace_id}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), settings.stream_encodings)
+    compressor = StreamCompressor(encoding) if encoding else None
+    if compressor is not None:
+        headers["Content-Encoding"] = encoding
+
+    return _RunStreamingResponse(
+        _encode_stream(buffer, compressor),
+        run=task,
+        buffer=buffer,
+        media_type=buffer.codec.media_type,
+        headers=headers,
+    )
 
-    asyncio.create_task(run_chat_stream(session, req, buffer, hook))
+def _end_run(ticket: Ticket, buffer: SerializedStreamBuffer, task: asyncio.Task) -> None:
+    _admission.release(ticket)
+    if task.cancelled():
+        buffer.abort()
 
-    return StreamingResponse(buffer.stream(), media_type="application/x-ndjson")
+async def _encode_stream(
+    buffer: SerializedStreamBuffer, compressor: Optional[StreamCompressor] = None
+) -> AsyncIterator[bytes]:
+    async for chunk in buffer.stream():
+        yield compressor.compress(chunk) if compressor is not None else chunk
+    if compressor is not None:
+        yield compressor.finish()
+
+class _RunStreamingResponse(StreamingResponse):
+    """
+    The response body of an agent run. However the response ends before the
+    run's last frame was sent (the client disconnected, or the body never
+    started), the run is cancelled.
+    """
+
+    def __init__(self, content, run: asyncio.Task, buffer: SerializedStreamBuffer, **kwargs):
+        super().__init__(content, **kwargs)
+        self.run = run
+        self.buffer = buffer
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A drained buffer means the run only has the session left to save
+            if not self.buffer.drained and not self.run.done():
+                self.run.cancel()
 
 # ───── 3. Retrieve a session ───────────────────────────────────
 @app.get("/sessions/{session_id}", response_model=Session)
 async def get_session(session_id: str):
-    session = _sessions.get(session_id)
+    session = await _sessions.aget(session_id)
     if not session:
         raise HTTPException(404, "Invalid session")
     return session
 
-# ───── 4. Health check ─────────────────────────────────────────
+# ───── 4. Result pages ─────────────────────────────────────────
+@app.get("/results/{result_id}")
+async def get_result_page(result_id: str, page: int = Query(0, ge=0), page_size: int = Query(None, ge=1, le=10000)):
+    """One page of a large DataFrame result as an Arrow IPC stream."""
+    # One lookup: a result evicted between a handle check and the read would come back empty
+    read = await asyncio.to_thread(_results.read, result_id, page, page_size)
+    if read is None:
+        raise HTTPException(404, "Unknown or expired result")
+    handle, data = read
+    size = page_size or handle.page_size
+    pages = max(1, -(-handle.rows // size))
+    headers = {"X-Total-Rows": str(handle.rows), "X-Page": str(page), "X-Pages": str(pages)}
+    if page + 1 < pages:
+        headers["X-Next-Page"] = str(page + 1)
+    return Response(content=data, media_type="application/vnd.apache.arrow.stream", headers=headers)
+
+# ───── 5. Artifacts ────────────────────────────────────────────
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    """A chart or table referenced by an `artifact` frame. Ids are content hashes, so responses never change."""
+    if _artifacts is None:
+        raise HTTPException(404, "Artifacts are disabled")
+    etag = f'"{artifact_id}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    entry = await asyncio.to_thread(_artifacts.get, artifact_id)
+    if entry is None:
+        raise HTTPException(404, "Unknown or expired artifact")
+    data, mime = entry
+    return Response(content=data, media_type=mime, headers=headers)
+
+# ───── 6. Metrics ──────────────────────────────────────────────
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of `spec.utils.metrics`."""
+    admission = _admission.stats()
+    metrics.chat_in_flight.set(admission["in_flight"])
+    metrics.chat_queued.set(admission["queued"])
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+# ───── 7. Traces ───────────────────────────────────────────────
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str, spans: bool = False, top: int = Query(10, ge=1, le=100)):
+    """Where a chat request (its `X-Trace-Id`) spent its time; `spans=true` adds every span."""
+    summary = tracer.memory.summary(trace_id, top=top) if tracer.memory is not None else None
+    if summary is None:
+        raise HTTPException(404, "Unknown or expired trace")
+    if spans:
+        summary["all_spans"] = [span.to_dict() for span in tracer.memory.spans(trace_id)]
+    return summary
+
+# ───── 8. Health check ─────────────────────────────────────────
 @app.get("/healthz")
 async def health_check():
     return {"status": "ok"}
@@ -89,6 +328,7 @@ def main() -> None:
         port=port,
         reload=True,
         debug=True,
+        # Result handles, artifacts and notebook kernels live in this process: one worker only
         workers=1
     )
 
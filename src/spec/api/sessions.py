@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from spec.api.schema import Session
+from spec.config import settings
+from spec.utils.lru import LRUCache
+
+
+def dump_session(session: Session) -> bytes:
+    """Compact serialization: minified JSON, zlib-compressed."""
+    payload = {
+        "id": session.id,
+        "username": session.username,
+        "init_time": session.init_time,
+        "messages": session.messages,
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":"), default=str).encode(), 6)
+
+
+def load_session(data: bytes) -> Session:
+    return Session.model_validate(json.loads(zlib.decompress(data)))
+
+
+class SessionStore(ABC):
+    """
+    Where the API server keeps chat sessions.
+
+    The sync methods may block (disk); the server uses the `a*` variants,
+    which run them in a thread unless the backend is purely in memory.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Session]: ...
+
+    @abstractmethod
+    def put(self, session: Session) -> None: ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None: ...
+
+    def close(self) -> None:
+        pass
+
+    async def aget(self, session_id: str) -> Optional[Session]:
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def aput(self, session: Session) -> None:
+        await asyncio.to_thread(self.put, session)
+
+    async def adelete(self, session_id: str) -> None:
+        await asyncio.to_thread(self.delete, session_id)
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions of this process only, bounded by count and idle time.
+
+    Sessions are kept serialized, so idle histories cost their compressed
+    size, and a caller mutating a Session never changes the stored copy.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: Optional[float] = 86400.0):
+        self._cache = LRUCache(max_items=max_sessions, ttl=ttl, sizeof=len)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        data = self._cache.get(session_id)
+        return load_session(data) if data is not None else None
+
+    def put(self, session: Session) -> None:
+        self._cache.put(session.id, dump_session(session))
+
+    def delete(self, session_id: str) -> None:
+        self._cache.pop(session_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    # Nothing blocks: no thread hop
+    async def aget(self, session_id: str) -> Optional[Session]:
+        return self.get(session_id)
+
+    async def aput(self, session: Session) -> None:
+        self.put(session)
+
+    async def adelete(self, session_id: str) -> None:
+        self.delete(session_id)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a local SQLite database in WAL mode.
+
+        • survives restarts and is shared by all workers on the host
+          (`uvicorn --workers N`); readers never block the writer
+        • one connection per thread
+        • sessions idle for more than `ttl` seconds are purged, at most
+          once per `purge_interval`
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400.0, purge_interval: float = 600.0):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY, username TEXT NOT NULL, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[Session]:
+        row = self._conn().execute(
+            "SELECT data, updated_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None or (self.ttl is not None and row[1] < time.time() - self.ttl):
+            return None
+        return load_session(row[0])
+
+    def put(self, session: Session) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO sessions (id, username, data, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (session.id, session.username, dump_session(session), now),
+        )
+        if self.ttl is not None and now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            self._conn().execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def build_session_store() -> SessionStore:
+    """The store selected by `settings.session_store`."""
+    ttl = settings.session_ttl or None
+    if settings.session_store == "sqlite":
+        return SQLiteSessionStore(settings.session_db_path, ttl=ttl)
+    if settings.session_store == "memory":
+        return MemorySessionStore(max_sessions=settings.session_max, ttl=ttl)
+    raise ValueError(f"Unknown session store '{settings.session_store}', use 'memory' or 'sqlite'")
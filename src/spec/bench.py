@@ -0,0 +1,185 @@
+"""Startup benchmark.
+
+Measures the cold-start cost of every startup phase of the service, each run in
+a fresh interpreter so that nothing is cached between runs:
+
+    spec-bench --repeat 5 --output bench.json --append bench_history.jsonl
+
+Phases (seconds, measured sequentially inside the child process):
+
+    config          `import spec.config`
+    cache           `import spec.cache` (includes `get_cache()`)
+    cache.<phase>   split of `get_cache()` as recorded in `Cache.timings`
+    notebook        `Notebook(env=...)` construction
+    agents          `import spec.agents` (on top of the cache)
+    api_import      `import spec.api.server`
+    api_ready       FastAPI startup + first `GET /healthz`
+    process         wall time of the whole child, interpreter startup included
+
+The result is a single JSON document; `--append` adds it as one line to a JSONL
+history file so runs can be compared across commits, and `--baseline` prints the
+delta against an earlier result.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent
+
+
+def _child(output: str) -> None:
+    """Run every phase once in this (fresh) interpreter and dump timings to *output*."""
+    timings: dict[str, float] = {}
+
+    def _measure(name: str, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    _measure("config", lambda: __import__("spec.config"))
+    cache_module = _measure("cache", lambda: __import__("spec.cache", fromlist=["cache"]))
+    for name, value in cache_module.cache.timings.items():
+        timings[f"cache.{name}"] = value
+
+    from spec.utils.notebook import Notebook
+    _measure("notebook", lambda: Notebook(env=dict(vars(cache_module))))
+
+    _measure("agents", lambda: __import__("spec.agents"))
+    server = _measure("api_import", lambda: __import__("spec.api.server", fromlist=["app"]))
+
+    async def _ready():
+        import httpx
+
+        app = server.app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.get("/healthz")
+                response.raise_for_status()
+
+    import asyncio
+    _measure("api_ready", lambda: asyncio.run(_ready()))
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(timings, f)
+
+
+def _run_once() -> dict[str, float]:
+    """Spawn one cold child process and return its phase timings."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "timings.json")
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "spec.bench", "--child", output],
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        elapsed = time.perf_counter() - start
+        with open(output, encoding="utf-8") as f:
+            timings = json.load(f)
+
+    timings["process"] = elapsed
+    return timings
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=SRC_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat: int = 3) -> dict:
+    """Benchmark *repeat* cold starts and aggregate the timings per phase."""
+    runs = [_run_once() for _ in range(repeat)]
+
+    phases: dict[str, dict] = {}
+    for name in runs[0]:
+        values = [r[name] for r in runs if name in r]
+        phases[name] = {
+            "min": min(values),
+            "median": statistics.median(values),
+            "max": max(values),
+            "runs": values,
+        }
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "phases": phases,
+    }
+
+
+def compare(result: dict, baseline: dict) -> dict[str, float]:
+    """Return the relative change of each phase median against *baseline*."""
+    deltas = {}
+    for name, stats in result["phases"].items():
+        base = baseline["phases"].get(name)
+        if base and base["median"] > 0:
+            deltas[name] = stats["median"] / base["median"] - 1
+    return deltas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the startup phases of the Spec Agent service.")
+    parser.add_argument("--repeat", type=int, default=3, help="number of cold starts to measure")
+    parser.add_argument("--output", help="write the JSON result to this file (default: stdout)")
+    parser.add_argument("--append", help="append the result as one line to this JSONL history file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="exit with status 1 if any phase median regresses by more than this fraction")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    result = run(args.repeat)
+    document = json.dumps(result, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(document + "\n", encoding="utf-8")
+    else:
+        print(document)
+
+    if args.append:
+        with open(args.append, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, separators=(",", ":")) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        deltas = compare(result, baseline)
+        for name, delta in deltas.items():
+            print(f"{name:<24} {result['phases'][name]['median']:>9.4f}s  {delta:+.1%}", file=sys.stderr)
+        if args.fail_above is not None and any(d > args.fail_above for d in deltas.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 import os
 import re
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
 from spec.config import *
 from spec.models import Specbook
+from spec.utils.bom import BOMGraph, bom_memory_report, read_bom_csv
+from spec.utils.bom_diff import bom_scope, diff_bom
+from spec.utils.bom_sql import BOMSQLEngine
+from spec.utils.cell_cache import CellCache
+from spec.utils.kernel import KernelPool
+from spec.utils.lru import LRUCache
 from spec.utils.notebook import Notebook
+from spec.utils.notebook_env import build_notebook_env
+from spec.utils.part_index import PartIndex
+from spec.utils.sandbox import CellLimits
 from spec.utils.s3 import S3
 from spec.utils.utils import load_txt
 
@@ -46,32 +58,201 @@ TMPL = """
 </Specbook>
 """
 
+def bom_data_version(path: str = PART_PARENT_CHILD_RELATIONSHIP_FILE) -> str:
+    # Changes whenever the BOM file is rewritten; keys the BOM closure cache
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+bom_closure_cache = LRUCache(max_bytes=settings.bom_closure_cache_mb * 1024**2)
+
+def build_bom_sql(BOM_df: pd.DataFrame) -> Optional[BOMSQLEngine]:
+    if not settings.bom_sql_enabled:
+        return None
+    parquet = settings.bom_parquet_snapshot
+    if parquet and not (
+        os.path.exists(parquet)
+        and os.path.getmtime(parquet) >= os.path.getmtime(PART_PARENT_CHILD_RELATIONSHIP_FILE)
+    ):
+        parquet = None  # missing or older than the CSV
+    return BOMSQLEngine(BOM_df, parquet=parquet or None, threads=settings.bom_sql_threads or None)
+
 @dataclass
 class Cache:
     BOM_df: pd.DataFrame
+    bom_graph: BOMGraph
+    part_index: PartIndex
     specbooks: dict
     s3: S3
+    bom_sql: Optional[BOMSQLEngine] = None
+    # Bytes of BOM_df, next to the estimate for plain object columns
+    bom_memory: dict = field(default_factory=dict)
+    # Seconds spent in each load phase, read by `spec.bench`
+    timings: dict[str, float] = field(default_factory=dict)
 
 @lru_cache(maxsize=1)
+def measure_bom_memory(BOM_df: pd.DataFrame) -> dict:
+    """
+    Measure the memory of the loaded *BOM_df*. With `settings.bom_memory_baseline`
+    and compact loading, the CSV is also read with plain dtypes and measured the
+    same way, so the logged savings compare two real frames.
+    """
+    baseline = None
+    if settings.bom_compact and settings.bom_memory_baseline:
+        baseline = read_bom_csv(PART_PARENT_CHILD_RELATIONSHIP_FILE, compact=False)
+    report = bom_memory_report(BOM_df, baseline)
+    del baseline
+    if report["before_bytes"] is None:
+        logger.info(f"BOM_df memory: {report['after_bytes'] / 1024**2:.1f} MiB loaded")
+    else:
+        logger.info(
+            f"BOM_df memory: {report['before_bytes'] / 1024**2:.1f} MiB with plain dtypes → "
+            f"{report['after_bytes'] / 1024**2:.1f} MiB loaded"
+        )
+    return report
+
+
 def get_cache() -> Cache:
+    timings: dict[str, float] = {}
+
+    start = time.perf_counter()
     s3 = S3()
-    BOM_df = pd.read_csv(PART_PARENT_CHILD_RELATIONSHIP_FILE)
+    timings["s3_client"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bom_version = bom_data_version()
+    BOM_df = read_bom_csv(PART_PARENT_CHILD_RELATIONSHIP_FILE, compact=settings.bom_compact)
+    timings["bom_csv"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bom_memory = measure_bom_memory(BOM_df)
+    timings["bom_memory"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bom_graph = BOMGraph(BOM_df, version=bom_version, closure_cache=bom_closure_cache)
+    timings["bom_graph"] = time.perf_counter() - start
+
+    if settings.bom_precompute_roots:
+        start = time.perf_counter()
+        bom_graph.precompute(settings.bom_precompute_roots)
+        timings["bom_precompute"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    part_index = PartIndex(bom_graph.part_ids)
+    timings["part_index"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bom_sql = build_bom_sql(BOM_df)
+    timings["bom_sql"] = time.perf_counter() - start
 
+    start = time.perf_counter()
     specbook_number_to_basenames = build_specbook_number_to_basenames(SPECBOOK_MD_FOLDER)
+    specbook_files = {
+        num: [load_txt(SPECBOOK_MD_FOLDER / f"{name}.txt") for name in names]
+        for num, names in specbook_number_to_basenames.items()
+    }
+    timings["specbook_files"] = time.perf_counter() - start
 
+    start = time.perf_counter()
     specbooks: dict[str, Specbook] = {}
-    for num, names in specbook_number_to_basenames.items():
-        files = [load_txt(SPECBOOK_MD_FOLDER / f"{name}.txt") for name in names]
+    for num, files in specbook_files.items():
         xml = TMPL.format(num=num, files="\n".join(files))
         specbooks[num] = Specbook(specbook_number=num, content=xml)
+    timings["specbook_xml"] = time.perf_counter() - start
 
     return Cache(
         BOM_df=BOM_df,
+        bom_graph=bom_graph,
+        part_index=part_index,
         specbooks=specbooks,
-        s3=s3
+        s3=s3,
+        bom_sql=bom_sql,
+        bom_memory=bom_memory,
+        timings=timings,
     )
 
 cache = get_cache()
 BOM_df = cache.BOM_df
+bom_graph = cache.bom_graph
+part_index = cache.part_index
+bom_sql = cache.bom_sql
 total_specbook = len(cache.specbooks)
-notebook = Notebook(env=globals())
\ No newline at end of file
+
+_bom_lock = threading.Lock()
+
+def refresh_bom() -> bool:
+    """Reload `BOM_df` and `bom_graph` if the BOM file changed since it was loaded."""
+    global BOM_df, bom_graph, part_index, bom_sql
+
+    with _bom_lock:
+        version = bom_data_version()
+        if version == cache.bom_graph.version:
+            return False
+
+        df = read_bom_csv(PART_PARENT_CHILD_RELATIONSHIP_FILE, compact=settings.bom_compact)
+        graph = BOMGraph(df, version=version, closure_cache=bom_closure_cache)
+        # Entries of the old version can never be hit again
+        bom_closure_cache.clear()
+        if cell_cache is not None:
+            cell_cache.clear()
+        graph.precompute(settings.bom_precompute_roots)
+        if settings.bom_precompute_top > 0:
+            # Roots that were hot before the reload most likely still are
+            graph.precompute(cache.bom_graph.frequent_roots(settings.bom_precompute_top))
+        index = PartIndex(graph.part_ids)
+        engine = build_bom_sql(df)
+
+        old_engine = cache.bom_sql
+        cache.BOM_df, cache.bom_graph, cache.bom_sql = df, graph, engine
+        cache.part_index = part_index = index
+        cache.bom_memory = measure_bom_memory(df)
+        BOM_df, bom_graph, bom_sql = df, graph, engine
+        if old_engine is not None:
+            # Frees the DuckDB copy of the old BOM
+            old_engine.close()
+        if kernel_pool is not None:
+            # New sessions get kernels forked from a zygote holding the new data
+            kernel_pool.recycle()
+        logger.info(f"Reloaded BOM data, version {version}")
+        return True
+
+def bom_cache_stats() -> dict:
+    """Hit/miss statistics of the BOM closure cache."""
+    return cache.bom_graph.closure_stats()
+
+def _watch_bom(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            if not refresh_bom() and settings.bom_precompute_top > 0:
+                # Re-warm the most requested explosions in case they were evicted
+                cache.bom_graph.precompute(top=settings.bom_precompute_top)
+        except Exception as e:
+            logger.error(f"Failed to reload BOM data: {e}")
+
+if settings.bom_watch_interval > 0:
+    threading.Thread(target=_watch_bom, args=(settings.bom_watch_interval,), daemon=True).start()
+
+cell_limits = CellLimits(
+    timeout=settings.cell_timeout or None,
+    max_memory_mb=settings.cell_max_memory_mb or None,
+    max_cpu_seconds=settings.cell_max_cpu_seconds or None,
+    max_output_chars=settings.cell_max_output_chars or None,
+    max_result_rows=settings.cell_max_result_rows or None,
+)
+notebook = Notebook(env=globals(), limits=cell_limits)
+
+# Notebook globals that cells read but never change; results of pure cells over them are shared
+NOTEBOOK_STABLE_NAMES = {"BOM_df", "bom_graph", "part_index", "bom_sql", "total_specbook", "pd", "diff_bom", "bom_scope"}
+cell_cache = CellCache(
+    NOTEBOOK_STABLE_NAMES, max_bytes=settings.cell_cache_mb * 1024**2, modules={"pd"}
+) if settings.cell_cache_mb > 0 else None
+
+# Cheap to create: the zygote is built on `start()` (the API's startup) or by the first session
+kernel_pool = KernelPool(
+    env_factory=build_notebook_env,
+    env_args=lambda: (BOM_df, bom_graph.version, total_specbook, settings.bom_sql_enabled, settings.bom_sql_threads or None),
+    size=settings.notebook_pool_size,
+    idle_ttl=settings.notebook_idle_ttl,
+    max_kernels=settings.notebook_max_kernels,
+    limits=cell_limits,
+) if settings.notebook_backend == "process" else None
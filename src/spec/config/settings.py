@@ -26,5 +26,88 @@ class Settings(BaseSettings):
     )
     
     s3_folder: str = "PDF_search"
+
+    # Load BOM_df with categorical / Arrow-backed string columns
+    bom_compact: bool = True
+    # Also read the BOM uncompacted once to measure the memory saved (loads the CSV twice)
+    bom_memory_baseline: bool = False
+
+    # BOM graph closure cache
+    bom_closure_cache_mb: int = 512
+    bom_precompute_roots: list[str] = []
+    bom_precompute_top: int = 10  # most requested roots re-warmed by the BOM watcher and across reloads, 0 disables
+    bom_watch_interval: float = 60.0  # seconds between checks of the BOM CSV, 0 disables reloading
+
+    # Optional DuckDB engine over the BOM (requires the `duckdb` package)
+    bom_sql_enabled: bool = False
+    bom_sql_threads: int = 0  # 0 = number of CPUs
+    bom_parquet_snapshot: str = ""  # used instead of BOM_df when newer than the BOM CSV
+
+    # Notebook kernels: "process" = one forked worker per session, "inprocess" = shared in-process namespace
+    notebook_backend: str = "process"
+    notebook_pool_size: int = 2  # prewarmed workers waiting for new sessions
+    notebook_idle_ttl: float = 900.0  # seconds before an idle session kernel is shut down
+    notebook_max_kernels: int = 32
+
+    # Per-cell limits of notebook cells, 0 disables a limit
+    cell_timeout: float = 120.0  # seconds
+    cell_max_memory_mb: int = 4096  # RSS growth during the cell, enforced in kernel workers only
+    cell_max_cpu_seconds: float = 600.0  # CPU time of all the cell's threads, enforced in kernel workers only
+    cell_max_output_chars: int = 20000
+    cell_max_result_rows: int = 200000
+    cell_cache_mb: int = 256  # results of pure cells shared by all sessions, 0 disables
+
+    # Chart rendering
+    chart_format: str = "png"  # "png", "webp" or "svg"; the image kind of API chart frames, png for existing clients
+    chart_dpi: int = 100
+    chart_max_px: int = 1600  # longest side of a rendered chart
+    chart_quality: int = 80  # webp quality
+    chart_workers: int = 2
+
+    # DataFrame results larger than one page are streamed as a handle plus the first page
+    result_page_rows: int = 500
+    result_store_mb: int = 512
+
+    # Conversation history sent to the agents (API and Streamlit)
+    history_budget_tokens: int = 60000
+    history_keep_turns: int = 3  # most recent turns kept verbatim
+    history_tool_output_tokens: int = 500  # older tool outputs above this are shortened
+
+    # Conversation logs: "s3" (segments under s3_folder) or "local" (JSONL files under log_dir)
+    log_sink: str = "s3"
+    log_dir: str = "logs"
+    log_flush_interval: float = 5.0
+
+    # API response stream
+    stream_queue_size: int = 64  # frames buffered per response before the agent run waits for the client
+    stream_coalesce_ms: float = 30.0  # text deltas are merged into one frame for this long...
+    stream_coalesce_chars: int = 2048  # ...or until this many characters are pending
+    stream_serializer: str = "auto"  # "orjson", "json", or "auto" (orjson when installed)
+    stream_encodings: list[str] = ["zstd", "gzip"]  # response compression, in order of preference; [] disables
+
+    # Admission control of /chat/stream runs
+    admission_max_in_flight: int = 32
+    admission_per_user: int = 2  # runs of one user at once; more wait in the fair queue
+    admission_max_queue: int = 256  # waiting requests in total before answering 429
+    admission_per_user_queue: int = 8  # waiting requests of one user before answering 429
+    admission_retry_after: int = 5  # seconds, Retry-After of the 429 response
+
+    # Request tracing: spans kept in memory for GET /traces/{id}, and optionally as JSONL under trace_dir
+    tracing_enabled: bool = True
+    trace_max: int = 1000  # traces kept in memory
+    trace_dir: str = ""
+
+    # Charts and tables are streamed as references to GET /artifacts/{id} instead of inline
+    stream_artifacts: bool = True
+    artifact_memory_mb: int = 256
+    artifact_dir: str = "artifacts"  # spill directory for artifacts evicted from memory, "" = drop them
+    artifact_disk_mb: int = 2048
+
+    # API session store: "memory" (this process, LRU/TTL) or "sqlite" (WAL database shared by the host's workers).
+    # Result pages, artifacts and notebook kernels stay per process, so the API still runs a single worker
+    session_store: str = "memory"
+    session_db_path: str = "sessions.db"
+    session_ttl: float = 86400.0  # seconds a session is kept after its last use, 0 = forever
+    session_max: int = 10000  # memory store only
     
 settings = Settings()
@@ -1,7 +1,7 @@
 
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from pydantic import BaseModel, Field
 
@@ -67,4 +67,5 @@ class Buffer:
 
 @dataclass    
 class ContextHook:
-    buffer: Buffer
\ No newline at end of file
+    buffer: Buffer
+    session_id: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,289 @@
+import asyncio
+from typing import List, Optional
+
+import pandas as pd
+from agents import RunContextWrapper, function_tool
+
+from spec.cache import cache
+from spec.config import logger
+from spec.models import ContextHook
+from spec.utils.bom_diff import bom_scope, diff_bom
+from spec.utils.tracing import traced
+
+PREVIEW_ROWS = 20
+GROUPABLE_COLUMNS = {"car_model", "group_type", "group_revision_status", "is_software", "file"}
+
+
+def _summary(df: pd.DataFrame, title: str, shown: Optional[int] = None) -> str:
+    """Compact description of a tool result for the LLM; the full frame (or its first *shown* rows) is in the UI."""
+    if df.empty:
+        return f"{title}: no matching rows."
+    if shown is None or shown >= len(df):
+        lines = [f"{title}: {len(df)} rows (displayed to the User)."]
+    else:
+        lines = [f"{title}: {len(df)} rows (the first {shown} displayed to the User, ask for a narrower scope to see all)."]
+    if "level" in df.columns:
+        lines.append(f"Levels: 1..{int(df['level'].max())}")
+    if "child_part_id" in df.columns:
+        lines.append(f"Distinct child parts: {df['child_part_id'].nunique()}")
+    lines.append(f"First {min(PREVIEW_ROWS, len(df))} rows:")
+    lines.append(df.head(PREVIEW_ROWS).to_string(index=False))
+    return "\n".join(lines)
+
+
+async def _show(
+    wrapper: RunContextWrapper[ContextHook], df: pd.DataFrame, title: str, max_rows: Optional[int] = None
+) -> str:
+    if not df.empty:
+        await wrapper.context.buffer.write(df if max_rows is None else df.head(max_rows))
+    # nunique over the child parts scans the whole frame
+    return await asyncio.to_thread(_summary, df, title, max_rows)
+
+
+def _scope(part_ids: Optional[List[str]], car_model: Optional[str]) -> pd.DataFrame:
+    """BOM rows below *part_ids* (or the whole BOM), optionally restricted to one car model."""
+    graph = cache.bom_graph
+    if part_ids:
+        return graph.explode(part_ids, car_model=car_model)
+    df = cache.BOM_df
+    if car_model is not None:
+        df = df[df["car_model"] == car_model]
+    return df
+
+
+@function_tool
+@traced()
+async def get_child_parts(wrapper: RunContextWrapper[ContextHook], part_ids: List[str], car_model: Optional[str] = None):
+    """
+    Retrieves the direct child parts (one BOM level) of the given parent parts.
+
+    Args:
+        part_ids (List[str]): The parent part IDs.
+        car_model (Optional[str]): Only return BOM lines of this car model (e.g. "VF8").
+
+    Returns:
+        str: Summary and preview of the matching BOM rows. The full table is displayed to the User.
+    """
+    logger.info(f"TOOL: get_child_parts({part_ids}, car_model={car_model})")
+    df = await asyncio.to_thread(cache.bom_graph.children, part_ids, car_model=car_model)
+    return await _show(wrapper, df, f"Child parts of {', '.join(part_ids)}")
+
+
+@function_tool
+@traced()
+async def get_descendant_parts(
+    wrapper: RunContextWrapper[ContextHook],
+    part_ids: List[str],
+    max_depth: Optional[int] = None,
+    car_model: Optional[str] = None,
+):
+    """
+    Retrieves the multi-level BOM explosion (all descendants, level by level) of the given parts.
+
+    Args:
+        part_ids (List[str]): The root part IDs.
+        max_depth (Optional[int]): Maximum number of BOM levels to descend. None = all levels.
+        car_model (Optional[str]): Only follow BOM lines of this car model (e.g. "VF8").
+
+    Returns:
+        str: Summary and preview of the matching BOM rows with their `level`. The full table is displayed to the User.
+    """
+    logger.info(f"TOOL: get_descendant_parts({part_ids}, max_depth={max_depth}, car_model={car_model})")
+    df = await asyncio.to_thread(cache.bom_graph.explode, part_ids, max_depth=max_depth, car_model=car_model)
+    return await _show(wrapper, df, f"BOM explosion of {', '.join(part_ids)}")
+
+
+@function_tool
+@traced()
+async def get_where_used(
+    wrapper: RunContextWrapper[ContextHook],
+    part_ids: List[str],
+    max_depth: Optional[int] = None,
+    car_model: Optional[str] = None,
+):
+    """
+    Retrieves all assemblies that use the given parts (reverse BOM lookup), level by level upwards.
+
+    Args:
+        part_ids (List[str]): The child part IDs.
+        max_depth (Optional[int]): Maximum number of BOM levels to ascend. None = up to the top-level assemblies.
+        car_model (Optional[str]): Only follow BOM lines of this car model (e.g. "VF8").
+
+    Returns:
+        str: Summary and preview of the matching BOM rows with their `level`. The full table is displayed to the User.
+    """
+    logger.info(f"TOOL: get_where_used({part_ids}, max_depth={max_depth}, car_model={car_model})")
+    df = await asyncio.to_thread(cache.bom_graph.where_used, part_ids, max_depth=max_depth, car_model=car_model)
+    return await _show(wrapper, df, f"Where-used of {', '.join(part_ids)}")
+
+
+@function_tool
+@traced()
+async def count_parts(
+    wrapper: RunContextWrapper[ContextHook],
+    group_by: List[str],
+    part_ids: Optional[List[str]] = None,
+    car_model: Optional[str] = None,
+):
+    """
+    Counts BOM lines and distinct child parts grouped by one or more columns.
+
+    Args:
+        group_by (List[str]): Columns to group by, any of "car_model", "group_type", "group_revision_status", "is_software", "file".
+        part_ids (Optional[List[str]]): Only count the BOM below these parts. None = the whole BOM.
+        car_model (Optional[str]): Only count BOM lines of this car model (e.g. "VF8").
+
+    Returns:
+        str: The count table. It is also displayed to the User.
+    """
+    logger.info(f"TOOL: count_parts(group_by={group_by}, part_ids={part_ids}, car_model={car_model})")
+    invalid = [c for c in group_by if c not in GROUPABLE_COLUMNS]
+    if invalid or not group_by:
+        return f"Invalid group_by columns {invalid}. Use any of: {', '.join(sorted(GROUPABLE_COLUMNS))}."
+
+    def count() -> pd.DataFrame:
+        return (
+            _scope(part_ids, car_model)
+            .groupby(group_by, observed=True, dropna=False)
+            .agg(bom_lines=("child_part_id", "size"), distinct_child_parts=("child_part_id", "nunique"))
+            .reset_index()
+            .sort_values("bom_lines", ascending=False)
+        )
+
+    counts = await asyncio.to_thread(count)
+    return await _show(wrapper, counts, f"Counts by {', '.join(group_by)}")
+
+
+@function_tool
+@traced()
+async def get_software_parts(
+    wrapper: RunContextWrapper[ContextHook],
+    part_ids: Optional[List[str]] = None,
+    car_model: Optional[str] = None,
+):
+    """
+    Retrieves the BOM lines of parts categorized as software.
+
+    Args:
+        part_ids (Optional[List[str]]): Only search the BOM below these parts. None = the whole BOM.
+        car_model (Optional[str]): Only return BOM lines of this car model (e.g. "VF8").
+
+    Returns:
+        str: Summary and preview of the software BOM rows. The full table is displayed to the User,
+            or only its first rows when neither `part_ids` nor `car_model` is given.
+    """
+    logger.info(f"TOOL: get_software_parts(part_ids={part_ids}, car_model={car_model})")
+
+    def software() -> pd.DataFrame:
+        df = _scope(part_ids, car_model)
+        return df[df["is_software"].fillna(False).astype(bool)]
+
+    df = await asyncio.to_thread(software)
+    # Unfiltered, this is every software line of the whole BOM; only a preview is streamed
+    max_rows = PREVIEW_ROWS if not part_ids and car_model is None else None
+    return await _show(wrapper, df, "Software parts", max_rows=max_rows)
+
+
+@function_tool
+@traced()
+async def compare_boms(
+    wrapper: RunContextWrapper[ContextHook],
+    left_car_model: Optional[str] = None,
+    right_car_model: Optional[str] = None,
+    left_group_id: Optional[str] = None,
+    right_group_id: Optional[str] = None,
+    left_revision_status: Optional[str] = None,
+    right_revision_status: Optional[str] = None,
+    part_ids: Optional[List[str]] = None,
+    max_depth: Optional[int] = None,
+):
+    """
+    Compares two BOM scopes (e.g. car model VF8 vs VF9, or two revision statuses of a group) and reports the
+    added, removed and changed parent-child edges. Each side is the whole BOM, or the subtree below `part_ids`,
+    filtered by its car model / group / revision status.
+
+    Args:
+        left_car_model (Optional[str]): Car model of the left side (e.g. "VF8").
+        right_car_model (Optional[str]): Car model of the right side (e.g. "VF9").
+        left_group_id (Optional[str]): Group ID of the left side.
+        right_group_id (Optional[str]): Group ID of the right side.
+        left_revision_status (Optional[str]): Group revision status of the left side.
+        right_revision_status (Optional[str]): Group revision status of the right side.
+        part_ids (Optional[List[str]]): Only compare the subtrees below these parts. None = the whole BOM.
+        max_depth (Optional[int]): Maximum number of BOM levels of the subtrees. None = all levels.
+
+    Returns:
+        str: Summary of the differences. The added, removed and changed edges are displayed to the User.
+    """
+    logger.info(
+        f"TOOL: compare_boms({left_car_model}/{left_group_id}/{left_revision_status} vs "
+        f"{right_car_model}/{right_group_id}/{right_revision_status}, part_ids={part_ids}, max_depth={max_depth})"
+    )
+    def compare():
+        BOM_df, bom_graph = cache.BOM_df, cache.bom_graph
+        sides = []
+        for car_model, group_id, revision_status in (
+            (left_car_model, left_group_id, left_revision_status),
+            (right_car_model, right_group_id, right_revision_status),
+        ):
+            scope = bom_scope(
+                BOM_df, bom_graph, part_ids, max_depth,
+                car_model=car_model, group_id=group_id, group_revision_status=revision_status,
+            )
+            label = "/".join(v for v in (car_model, group_id, revision_status) if v) or "all"
+            sides.append((scope, label))
+        (left, left_label), (right, right_label) = sides
+        if left_label == right_label:
+            right_label += " (right)"
+        return diff_bom(left, right, labels=(left_label, right_label))
+
+    # Both explosions, the scope filters and the diff scan the BOM: all off the event loop
+    diff = await asyncio.to_thread(compare)
+    for frame in (diff.added, diff.removed, diff.changed):
+        if not frame.empty:
+            await wrapper.context.buffer.write(frame)
+    return diff.summary()
+
+
+@function_tool
+@traced()
+def search_part_ids(query: str, limit: int = 10):
+    """
+    Finds the part IDs in the BOM that best match a partial or possibly mistyped part number.
+    Use it whenever a part number given by the User is not found exactly.
+
+    Args:
+        query (str): The partial or mistyped part number.
+        limit (int): Maximum number of candidates to return.
+
+    Returns:
+        str: Candidate part IDs ranked by similarity score (1.0 = exact match).
+    """
+    logger.info(f"TOOL: search_part_ids({query})")
+    candidates = cache.part_index.search(query, limit=limit)
+    if not candidates:
+        return f"No part IDs similar to '{query}'."
+    return "\n".join(f"{part_id}\t{score:.2f}" for part_id, score in candidates)
+
+
+@function_tool
+@traced()
+async def query_bom_sql(wrapper: RunContextWrapper[ContextHook], sql: str):
+    """
+    Runs a read-only DuckDB SQL query over the table `bom`, which has the same columns as `BOM_df`.
+    Use it for large aggregations, joins and recursive (WITH RECURSIVE) hierarchy queries. Only a single SELECT statement is allowed.
+
+    Args:
+        sql (str): The SELECT statement to execute.
+
+    Returns:
+        str: Summary and preview of the query result. The full table is displayed to the User.
+    """
+    logger.info(f"TOOL: query_bom_sql: \n{sql}")
+    if cache.bom_sql is None:
+        return "The BOM SQL engine is not enabled."
+    try:
+        df = await asyncio.to_thread(cache.bom_sql.run, sql)
+    except Exception as e:
+        return f"Error executing SQL: {e}"
+    return await _show(wrapper, df, "Query result")
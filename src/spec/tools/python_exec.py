@@ -1,12 +1,22 @@
+import json
+
 from agents import RunContextWrapper, function_tool
 
-from spec.cache import notebook
+from spec.cache import cache, cell_cache, kernel_pool, notebook
 from spec.config import logger
 from spec.models import ContextHook
 from spec.utils.notebook import NotebookCellOutput
+from spec.utils.tracing import traced, tracer
+
 
+async def _execute(session_id: str, code: str) -> NotebookCellOutput:
+    if kernel_pool is not None:
+        return await kernel_pool.aexec(session_id, code)
+    return await notebook.aexec(code)
 
-@function_tool  
+
+@function_tool
+@traced()
 async def code_interpreter(wrapper: RunContextWrapper[ContextHook], python_code: str):
     """
     This function is used to execute Python code in a stateful Jupyter notebook environment. python will respond with the output of the execution. Internet access for this session is disabled. Do not make external web requests or API calls as they will fail.
@@ -20,10 +30,32 @@ async def code_interpreter(wrapper: RunContextWrapper[ContextHook], python_code:
     try:
         logger.info(f"TOOL: code_interpreter: \n{python_code}")
         
-        output: NotebookCellOutput = notebook.exec(python_code)
+        # The in-process notebook has one namespace shared by all sessions
+        session_id = (wrapper.context.session_id if kernel_pool is not None else None) or "default"
+        version = kernel_pool.data_version(session_id) if kernel_pool is not None else None
+        if version is None:
+            # No kernel or zygote yet: the one started for this cell loads the current data
+            version = cache.bom_graph.version
+
+        output = cell_cache.get(session_id, python_code, version) if cell_cache is not None else None
+        with tracer.span("notebook.cell", kind="cell", cached=output is not None, lines=python_code.count("\n") + 1) as span:
+            if output is not None:
+                logger.info("code_interpreter: cell result served from cache")
+                imports = cell_cache.analyze(python_code).imports
+                if imports:
+                    # Later cells may rely on the modules the cached cell imported
+                    await _execute(session_id, imports)
+            else:
+                output: NotebookCellOutput = await _execute(session_id, python_code)
+                if cell_cache is not None:
+                    cell_cache.put(session_id, python_code, version, output)
+            if span is not None and output.error:
+                span.status, span.error = "error", str(output.error.get("error", "error"))
         for var in output.vars:
             await wrapper.context.buffer.write(var)        
         
+        if output.error:
+            return f"{output.console}\n{json.dumps(output.error)}"
         return output.console    
     
     except Exception as e:
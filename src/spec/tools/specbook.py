@@ -11,10 +11,13 @@ from spec.cache import *
 from spec.config import logger, settings
 from spec.models import ContextHook, Specbook, SpecbookRelevanceContent
 from spec.utils.llm import acompletion_with_backoff
+from spec.utils.metrics import specbook_fanout, specbook_relevant
+from spec.utils.tracing import traced, tracer
 from spec.utils.utils import num_tokens_from_text
 
 
 @function_tool
+@traced()
 async def get_relevant_specbook_content_by_query_partial_context(wrapper: RunContextWrapper[ContextHook], query: str):
     """
     Retrieves specbook contents relevant to the given query and formats them in XML.
@@ -28,54 +31,68 @@ async def get_relevant_specbook_content_by_query_partial_context(wrapper: RunCon
     logger.info(f"TOOL: get_specbook_content_by_query({query})")
     
     start_time = time.time()
+
+    # Resolve partial / mistyped part codes once, before fanning out to every specbook
+    resolved = cache.part_index.resolve_text(query)
+    if resolved:
+        logger.info(f"Resolved part IDs: {resolved}")
+        query += "\nPart IDs resolved from the BOM: " + ", ".join(f"{k} → {v}" for k, v in resolved.items())
     
     # Start loading message task
     async def print_loading_messages():
         # Separator
-        wrapper.context.buffer.write("\n\n---\n\n")
+        await wrapper.context.buffer.write("\n\n---\n\n")
         
         idx = 0
         ms = settings.loading_messages
         while True:
-            wrapper.context.buffer.write(ms[idx])
+            await wrapper.context.buffer.write(ms[idx])
             idx = (idx + 1) % len(ms)
             await asyncio.sleep(8)
 
     specbook_numbers = list(cache.specbooks.keys())
+    specbook_fanout.observe(len(specbook_numbers))
     specbooks = cache.specbooks
 
     async def _process_one(spec_no: str) -> Tuple[SpecbookRelevanceContent, str]:      
         content = specbooks[spec_no].content
-        try:
-            async with settings.semaphore:
-                async with asyncio.timeout(settings.timeout_per_specbook):
-                    completion = await acompletion_with_backoff(
-                        model="gpt-4o-mini",
-                        messages =[
-                            {"role": "system", "content": SPECBOOK_RELEVANCE_PROMPT.format(query=query)}, 
-                            {"role": "user", "content": content}
-                        ],
-                        response_format=SpecbookRelevanceContent
-                    )
-                    parsed = completion.choices[0].message.parsed
-        except Exception as e:
-            # Return IRRELEVANT if error
-            return SpecbookRelevanceContent(reasoning="LIMIT TOKEN / TIMEOUT", relevance_content="", is_relevant=False), spec_no
-
-        return parsed, spec_no
+        with tracer.span("specbook", kind="specbook", specbook=spec_no) as span:
+            try:
+                async with settings.semaphore:
+                    async with asyncio.timeout(settings.timeout_per_specbook):
+                        completion = await acompletion_with_backoff(
+                            model="gpt-4o-mini",
+                            messages =[
+                                {"role": "system", "content": SPECBOOK_RELEVANCE_PROMPT.format(query=query)}, 
+                                {"role": "user", "content": content}
+                            ],
+                            response_format=SpecbookRelevanceContent
+                        )
+                        parsed = completion.choices[0].message.parsed
+            except Exception as e:
+                # Return IRRELEVANT if error
+                if span is not None:
+                    span.status, span.error = "error", f"{type(e).__name__}: {e}"
+                return SpecbookRelevanceContent(reasoning="LIMIT TOKEN / TIMEOUT", relevance_content="", is_relevant=False), spec_no
+
+            if span is not None:
+                span.attributes["relevant"] = parsed.is_relevant
+            return parsed, spec_no
 
     # Create and start loading message task
     loading_task = asyncio.create_task(print_loading_messages())
 
-    # Run the main processing with timeout
-    snippets = await asyncio.gather(*(_process_one(n) for n in specbook_numbers))
-
-    # Cancel loading message task when the main processing is done or timeout
-    loading_task.cancel()
-    wrapper.context.buffer.write("\n\n---\n\n")
+    # Run the main processing with timeout; if the run is cancelled, gather cancels every pending request
+    try:
+        snippets = await asyncio.gather(*(_process_one(n) for n in specbook_numbers))
+    finally:
+        # Cancel loading message task when the main processing is done, timed out or cancelled
+        loading_task.cancel()
+    await wrapper.context.buffer.write("\n\n---\n\n")
 
     # Sort snippets by relevance level in descending order
     sorted_snippets = [(parsed, spec_no) for parsed, spec_no in snippets if parsed.is_relevant]
+    specbook_relevant.observe(len(sorted_snippets))
     
     MAX_RELEVANCE_TOKENS = 5000000
     infor, count = "", 0
@@ -171,6 +188,7 @@ async def get_relevant_specbook_content_by_query_partial_context(wrapper: RunCon
 #     return infor, sorted_snippets
 
 @function_tool
+@traced()
 def get_specbook_content_by_specbook_numbers(specbook_numbers: List[str]):
     """
     Retrieves specbook contents by list of specbook numbers and formats them in XML.
@@ -185,6 +203,7 @@ def get_specbook_content_by_specbook_numbers(specbook_numbers: List[str]):
     return "\n".join([specbook.content for specbook in specbooks])
 
 @function_tool
+@traced()
 async def get_specbook_numbers_table(wrapper: RunContextWrapper[ContextHook]):
     """
     Retrieves the dataframe of specbook numbers available.
@@ -193,5 +212,5 @@ async def get_specbook_numbers_table(wrapper: RunContextWrapper[ContextHook]):
         str: a Dataframe of specbook numbers
     """
     df = pd.DataFrame(list(cache.specbooks.keys()), columns=["specbook_number"])
-    wrapper.context.buffer.write(df)
+    await wrapper.context.buffer.write(df)
     return df
\ No newline at end of file
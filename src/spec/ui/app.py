@@ -12,12 +12,15 @@ from openai.types.responses import ResponseTextDeltaEvent
 from PIL import Image
 
 from spec.agents import triage_agent
+from spec.agents.hooks import run_hooks
 from spec.config import *
 from spec.models import ContextHook
 from spec.ui.authen import Authenticator
 from spec.ui.schema import RawObjectBuffer
 from spec.ui.session import SessionManager
-from spec.utils.utils import save_messages
+from spec.utils.charts import RenderedChart
+from spec.utils.conversation_log import get_conversation_log, loggable_content
+from spec.utils.history import history_manager
 
 
 class UI:
@@ -53,35 +56,61 @@ class UI:
             self.render_new_chat()
 
         # ─── Render the history ────────────────────────────────────────────────────────
-        for res in st.session_state.ui_messages:
+        for i, res in enumerate(st.session_state.ui_messages):
             try:
                 with st.chat_message(res["role"]):
                     if isinstance(res["content"], str):
                         st.write(res["content"])
                     elif isinstance(res["content"], list):
-                        for c in res["content"]:
+                        for j, c in enumerate(res["content"]):
                             if isinstance(c, str):
                                 st.write(c)
                             elif isinstance(c, pd.DataFrame):
-                                st.dataframe(c)
+                                self.render_dataframe(c, key=f"df_{i}_{j}")
                             elif isinstance(c, Image.Image):
                                 st.image(c)
                             elif isinstance(c, Figure):
                                 st.pyplot(c)
+                            elif isinstance(c, RenderedChart):
+                                st.markdown(c._repr_html_(), unsafe_allow_html=True)
             except Exception as e:
                 continue
 
 
-def run_agent_stream(agent: Agent, agent_messages: list[TResponseInputItem], buffer: RawObjectBuffer, hook: ContextHook):
+    @staticmethod
+    def render_dataframe(df: pd.DataFrame, key: str):
+        """Show large frames one page at a time instead of sending the whole frame to the browser."""
+        page_rows = settings.result_page_rows
+        if len(df) <= page_rows:
+            st.dataframe(df)
+            return
+        pages = -(-len(df) // page_rows)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key)
+        st.dataframe(df.iloc[(page - 1) * page_rows: page * page_rows])
+        st.caption(f"{len(df)} rows x {df.shape[1]} columns")
+
+
+def run_agent_stream(agent: Agent, agent_messages: list[TResponseInputItem], prompt: str, buffer: RawObjectBuffer, hook: ContextHook):
     async def _runner():
-        result = Runner.run_streamed(agent, input=agent_messages, context=hook)
-        
-        async for ev in result.stream_events():
-            if ev.type == "raw_response_event" and isinstance(ev.data, ResponseTextDeltaEvent):
-                await buffer.write(ev.data.delta)
-        await buffer.close()
-        
-        st.session_state["agent_messages"] = result.to_input_list()
+        result = error = None
+        agent_input = history_manager.agent_input(agent_messages, prompt)
+        try:
+            result = Runner.run_streamed(agent, input=agent_input, context=hook, hooks=run_hooks)
+
+            async for ev in result.stream_events():
+                if ev.type == "raw_response_event" and isinstance(ev.data, ResponseTextDeltaEvent):
+                    await buffer.write(ev.data.delta)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # The hooks are shared by all runs: drop what a failed or aborted run left behind
+            if result is not None:
+                run_hooks.discard(result.context_wrapper, error=error)
+            await buffer.close()
+
+        # The run saw a compacted history; the stored one stays complete
+        st.session_state["agent_messages"] = agent_messages + result.to_input_list()[len(agent_input) - 1:]
     
     return asyncio.run(_runner())
 
@@ -98,23 +127,23 @@ class App:
         
         input = {"role": "user", "content": prompt}
         st.session_state["ui_messages"].append(input)
-        st.session_state["agent_messages"].append(input)
         
         buffer = RawObjectBuffer()
-        context_hook = ContextHook(buffer)
+        context_hook = ContextHook(buffer, session_id=st.session_state["session_id"])
         
-        threading.Thread(target=run_agent_stream, args=(triage_agent, st.session_state["agent_messages"], buffer, context_hook), daemon=True).start()
+        threading.Thread(target=run_agent_stream, args=(triage_agent, st.session_state["agent_messages"], prompt, buffer, context_hook), daemon=True).start()
 
         with st.chat_message("assistant"):
             response = st.write_stream(buffer.stream())
             
-        st.session_state["ui_messages"].append({"role": "assistant", "content": response})
+        answer = {"role": "assistant", "content": response}
+        st.session_state["ui_messages"].append(answer)
         
-        # Save to S3
-        save_messages(
-            messages=st.session_state["ui_messages"], 
-            folder=f"{settings.s3_folder}/{st.session_state['username']}/logs", 
-            filename=f"{st.session_state['init_time']}.json")
+        # Append this turn to the conversation log (written to S3 in the background)
+        get_conversation_log().append(
+            f"{settings.s3_folder}/{st.session_state['username']}/logs/{st.session_state['init_time']}",
+            [input, {"role": "assistant", "content": loggable_content(response)}],
+        )
         
         
     def run(self):
@@ -1,7 +1,11 @@
 import queue
 from typing import Any, AsyncIterator
 
+from matplotlib.figure import Figure
+from PIL import Image
+
 from spec.models import Buffer
+from spec.utils.charts import chart_renderer
 
 
 class RawObjectBuffer(Buffer):
@@ -10,6 +14,8 @@ class RawObjectBuffer(Buffer):
         self._queue: queue.Queue[Any] = queue.Queue()
 
     async def write(self, obj: Any):
+        if isinstance(obj, (Image.Image, Figure)):
+            obj = await chart_renderer.arender(obj)
         self._queue.put(obj)
 
     async def close(self):
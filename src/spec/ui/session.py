@@ -1,7 +1,9 @@
 from datetime import datetime
+from uuid import uuid4
 
 import streamlit as st
 
+from spec.cache import kernel_pool
 from spec.ui.authen import Authenticator, Captcha
 
 
@@ -20,10 +22,14 @@ class SessionManager():
         state.setdefault("blocked_users", get_blocked_users())
         state.setdefault("username", authenticator.username())
         state.setdefault("init_time", datetime.now().strftime('%Y-%m-%d_%H-%M-%S'))
+        state.setdefault("session_id", str(uuid4()))
         
     def reset_conversation(self):
         """Resets conversation state."""
 
         st.session_state["ui_messages"] = []
         st.session_state['agent_messages'] = []
-        st.session_state["init_time"] = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
\ No newline at end of file
+        st.session_state["init_time"] = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        if kernel_pool is not None:
+            kernel_pool.release(st.session_state["session_id"])
+        st.session_state["session_id"] = str(uuid4())
\ No newline at end of file
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from spec.config import logger
+from spec.utils.lru import LRUCache
+
+__all__ = ["Artifact", "ArtifactStore"]
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """Reference to stored content; the id is the SHA-256 of the bytes."""
+
+    id: str
+    mime: str
+    size: int
+
+    def to_dict(self) -> dict:
+        return {"kind": "artifact", "id": self.id, "mime": self.mime, "size": self.size}
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of the charts and tables sent to clients.
+
+        • id = SHA-256 of the content: the same chart or table is stored
+          once, and its id (and URL) never changes, so clients can cache it
+          for good
+        • hot artifacts stay in memory (LRU, `max_memory_bytes`); evicted
+          ones are spilled to `spill_dir` and read back on demand
+        • the spill directory is bounded by `max_disk_bytes`, oldest first;
+          each process spills into its own `spill_dir/<pid>` subdirectory,
+          and those of processes that are gone are removed on start
+        • so an artifact id only resolves on the server worker that stored
+          it: the API runs one worker
+
+    Usage:
+        store = ArtifactStore(max_memory_bytes=256 * 1024**2, spill_dir="artifacts")
+        artifact = store.put(png_bytes, "image/png")
+        data, mime = store.get(artifact.id)
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        self.spill_dir = os.path.join(spill_dir, str(os.getpid())) if spill_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = LRUCache(
+            max_bytes=max_memory_bytes,
+            sizeof=lambda entry: len(entry[0]),
+            on_evict=self._evicted if spill_dir else None,
+        )
+        # Evicted from memory, not yet written to disk: id -> (content, mime)
+        self._pending: dict[str, Tuple[bytes, str]] = {}
+        self._pending_lock = threading.Lock()
+        # Spilled artifacts: id -> (mime, size), oldest first
+        self._disk: OrderedDict[str, Tuple[str, int]] = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        if spill_dir:
+            _remove_stale(spill_dir)
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def put(self, data: bytes, mime: str) -> Artifact:
+        artifact_id = hashlib.sha256(data).hexdigest()
+        artifact = Artifact(id=artifact_id, mime=mime, size=len(data))
+        if artifact_id in self._memory:
+            self._memory.get(artifact_id)  # refresh
+        elif not self._memory.put(artifact_id, (data, mime)) and self.spill_dir:
+            # Larger than the whole memory budget: straight to disk
+            self._spill(artifact_id, (data, mime))
+        self._flush()
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[Tuple[bytes, str]]:
+        """(content, mime) of an artifact, or None if it is unknown or was dropped."""
+        entry = self._memory.get(artifact_id)
+        if entry is not None:
+            return entry
+        with self._pending_lock:
+            entry = self._pending.get(artifact_id)
+        if entry is not None:
+            return entry
+        with self._disk_lock:
+            meta = self._disk.get(artifact_id)
+        if meta is None:
+            return None
+        try:
+            with open(self._path(artifact_id), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._memory.put(artifact_id, (data, meta[0]))
+        self._flush()
+        return data, meta[0]
+
+    def mime(self, artifact_id: str) -> Optional[str]:
+        entry = self._memory.get(artifact_id)
+        if entry is None:
+            with self._pending_lock:
+                entry = self._pending.get(artifact_id)
+        if entry is not None:
+            return entry[1]
+        with self._disk_lock:
+            meta = self._disk.get(artifact_id)
+        return meta[0] if meta else None
+
+    def stats(self) -> dict:
+        with self._disk_lock:
+            disk = {"disk_items": len(self._disk), "disk_bytes": self._disk_bytes}
+        return {**self._memory.stats(), **disk}
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _path(self, artifact_id: str) -> str:
+        return os.path.join(self.spill_dir, artifact_id[:2], artifact_id)
+
+    def _evicted(self, artifact_id: str, entry: Tuple[bytes, str]) -> None:
+        # Called under the memory cache's lock: only queue, `_flush` writes once it is released
+        with self._pending_lock:
+            self._pending[artifact_id] = entry
+
+    def _flush(self) -> None:
+        """Write the artifacts evicted from memory to the spill directory."""
+        with self._pending_lock:
+            pending = list(self._pending.items())
+        for artifact_id, entry in pending:
+            self._spill(artifact_id, entry)
+            with self._pending_lock:
+                if self._pending.get(artifact_id) is entry:
+                    del self._pending[artifact_id]
+
+    def _spill(self, artifact_id: str, entry: Tuple[bytes, str]) -> None:
+        data, mime = entry
+        with self._disk_lock:
+            if artifact_id in self._disk:
+                self._disk.move_to_end(artifact_id)
+                return
+        path = self._path(artifact_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Content-addressed, so concurrent writers of the same id write the same bytes
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Failed to spill artifact {artifact_id}: {e}")
+            return
+
+        dropped = []
+        with self._disk_lock:
+            if artifact_id not in self._disk:
+                self._disk[artifact_id] = (mime, len(data))
+                self._disk_bytes += len(data)
+            while self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_id, (_, size) = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                dropped.append(old_id)
+        for old_id in dropped:
+            try:
+                os.remove(self._path(old_id))
+            except FileNotFoundError:
+                pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_stale(spill_dir: str) -> None:
+    """Remove the spill subdirectories of processes that no longer run (and a reused one of ours)."""
+    try:
+        names = os.listdir(spill_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.isdigit() and (int(name) == os.getpid() or not _pid_alive(int(name))):
+            shutil.rmtree(os.path.join(spill_dir, name), ignore_errors=True)
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from spec.config import logger
+from spec.utils.lru import LRUCache
+
+__all__ = ["BOMGraph", "read_bom_csv", "bom_memory_report"]
+
+PartIds = str | Iterable[str]
+CarModels = Optional[str | Iterable[str]]
+
+# Few distinct values repeated on every row → dictionary-encoded
+BOM_CATEGORICAL_COLUMNS = ["car_model", "file", "group_type", "group_revision_status"]
+# High-cardinality identifiers → Arrow-backed strings (one contiguous buffer, no per-row Python objects)
+BOM_STRING_COLUMNS = ["part_id", "child_part_id", "group_id"]
+# Numeric columns → nullable integers, so sorting and comparisons stay numeric when a value is missing
+BOM_INTEGER_COLUMNS = {"bom_line_number": "Int32"}
+
+try:
+    import pyarrow  # noqa: F401
+    _STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    _STRING_DTYPE = "string"
+
+
+def read_bom_csv(path: str, compact: bool = True) -> pd.DataFrame:
+    """
+    Read the BOM edge list. With *compact*, low-cardinality columns are parsed
+    straight into categoricals, identifiers into Arrow-backed strings and
+    numeric columns into nullable integers, so the object-column representation
+    is never materialized.
+
+    Integer part codes are assigned by `BOMGraph`, which factorizes the part ID
+    columns once when the graph is built.
+    """
+    if not compact:
+        return pd.read_csv(path)
+
+    columns = pd.read_csv(path, nrows=0).columns
+    dtype = {c: "category" for c in BOM_CATEGORICAL_COLUMNS if c in columns}
+    dtype.update({c: _STRING_DTYPE for c in BOM_STRING_COLUMNS if c in columns})
+    integers = {c: t for c, t in BOM_INTEGER_COLUMNS.items() if c in columns}
+    try:
+        return pd.read_csv(path, dtype={**dtype, **integers})
+    except (ValueError, OverflowError):
+        # Non-integer values: leave those columns to pandas' own inference, like the plain read
+        logger.warning(f"{path}: {list(integers)} are not all integers, reading them with inferred dtypes")
+        return pd.read_csv(path, dtype=dtype)
+
+
+def bom_memory_report(df: pd.DataFrame, baseline: Optional[pd.DataFrame] = None) -> dict:
+    """
+    Memory of *df* in bytes, measured with `memory_usage(deep=True)`. With a
+    *baseline* frame (the same file read with `compact=False`), its measured
+    memory is reported next to it; otherwise the "before" fields are None.
+    """
+    after = df.memory_usage(deep=True, index=False)
+    before = baseline.memory_usage(deep=True, index=False) if baseline is not None else None
+    return {
+        "before_bytes": int(before.sum()) if before is not None else None,
+        "after_bytes": int(after.sum()),
+        "columns": {
+            c: {"before": int(before[c]) if before is not None and c in before else None, "after": int(after[c])}
+            for c in df.columns
+        },
+    }
+
+
+@dataclass
+class _CSR:
+    """Compressed sparse row adjacency: neighbours of node `i` live in `indices[indptr[i]:indptr[i + 1]]`."""
+
+    indptr: np.ndarray   # int64, num_nodes + 1
+    indices: np.ndarray  # int32, neighbour node per edge
+    edges: np.ndarray    # int64, row position of the edge in the source DataFrame
+
+    @classmethod
+    def build(cls, src: np.ndarray, dst: np.ndarray, edges: np.ndarray, num_nodes: int) -> "_CSR":
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=indptr[1:])
+        return cls(indptr=indptr, indices=dst[order].astype(np.int32), edges=edges[order])
+
+    def gather(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (neighbours, edge rows) of all *nodes* in one vectorized pass."""
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        # Position of every outgoing edge: start of its node's run + offset inside the run
+        run_offsets = np.cumsum(counts) - counts
+        positions = np.repeat(starts - run_offsets, counts) + np.arange(total)
+        return self.indices[positions], self.edges[positions]
+
+
+class BOMGraph:
+    """
+    Integer-encoded parent/child graph over the BOM edge list.
+
+    Part IDs are factorized once into dense integer codes and the edges are
+    stored as CSR adjacency arrays in both directions (parent → children and
+    child → parents), so multi-level explosions and where-used lookups are a
+    handful of vectorized numpy operations per BOM level instead of repeated
+    DataFrame merges.
+
+    All query methods return the matching rows of the original DataFrame with
+    an extra leading `level` column (1 = direct children / direct parents).
+
+    When a *closure_cache* is given, explosions are memoized in it under the
+    graph *version* (the data version of the source file), so a reloaded graph
+    never reads entries computed from older data. A cached unlimited explosion
+    also answers every depth-limited query on the same roots.
+
+    Usage:
+        graph = BOMGraph(BOM_df)
+        graph.explode("BAT00001", max_depth=3, car_model="VF8")
+        graph.where_used("CHS00042")
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        parent_col: str = "part_id",
+        child_col: str = "child_part_id",
+        model_col: str = "car_model",
+        version: Optional[str] = None,
+        closure_cache: Optional[LRUCache] = None,
+    ):
+        self.df = df
+        self.parent_col = parent_col
+        self.child_col = child_col
+        self.model_col = model_col
+        self.version = version
+        self.closure_cache = closure_cache
+        self._requests: Counter = Counter()
+        self._requests_lock = threading.Lock()
+
+        n = len(df)
+        codes, uniques = pd.factorize(
+            pd.concat([df[parent_col], df[child_col]], ignore_index=True), sort=False
+        )
+        self.part_ids = pd.Index(uniques)
+        self.num_parts = len(self.part_ids)
+
+        src, dst = codes[:n], codes[n:]
+        valid = (src >= 0) & (dst >= 0)
+        rows = np.flatnonzero(valid)
+        src, dst = src[valid], dst[valid]
+
+        self.down = _CSR.build(src, dst, rows, self.num_parts)
+        self.up = _CSR.build(dst, src, rows, self.num_parts)
+
+        model_codes, models = pd.factorize(df[model_col], sort=True)
+        self.car_models = pd.Index(models)
+        self._edge_model = model_codes.astype(np.int16)
+
+    # ───────────────────────────── public API ──────────────────────────────────
+    def codes(self, part_ids: PartIds) -> np.ndarray:
+        """Integer codes of *part_ids*; unknown IDs are dropped."""
+        if isinstance(part_ids, str):
+            part_ids = [part_ids]
+        codes = self.part_ids.get_indexer(list(part_ids))
+        return np.unique(codes[codes >= 0])
+
+    def explode(self, part_ids: PartIds, max_depth: Optional[int] = None, car_model: CarModels = None) -> pd.DataFrame:
+        """Multi-level BOM explosion: every edge below *part_ids*, level by level."""
+        return self._frame(*self._closure("down", self.codes(part_ids), max_depth, car_model))
+
+    def where_used(self, part_ids: PartIds, max_depth: Optional[int] = None, car_model: CarModels = None) -> pd.DataFrame:
+        """Reverse explosion: every edge above *part_ids*, i.e. the assemblies that use them."""
+        return self._frame(*self._closure("up", self.codes(part_ids), max_depth, car_model))
+
+    def children(self, part_ids: PartIds, car_model: CarModels = None) -> pd.DataFrame:
+        """Direct children of *part_ids*."""
+        return self.explode(part_ids, max_depth=1, car_model=car_model)
+
+    def parents(self, part_ids: PartIds, car_model: CarModels = None) -> pd.DataFrame:
+        """Direct parents of *part_ids*."""
+        return self.where_used(part_ids, max_depth=1, car_model=car_model)
+
+    def roots(self) -> pd.Index:
+        """Top-level assemblies: parts that have children but are never used as a child."""
+        has_children = np.diff(self.down.indptr) > 0
+        has_parents = np.diff(self.up.indptr) > 0
+        return self.part_ids[has_children & ~has_parents]
+
+    def precompute(self, part_ids: Optional[PartIds] = None, top: int = 10) -> int:
+        """
+        Warm the closure cache with full explosions of *part_ids*, or of the *top*
+        most frequently requested roots when *part_ids* is None. Returns the number
+        of explosions computed.
+        """
+        if self.closure_cache is None:
+            return 0
+        if part_ids is None:
+            part_ids = self.frequent_roots(top)
+        roots = self.codes(part_ids).tolist()
+
+        computed = 0
+        for code in roots:
+            key = self._cache_key("down", np.array([code]), None, None)
+            if key not in self.closure_cache:
+                self.closure_cache.put(key, self._traverse(self.down, np.array([code]), None, None))
+                computed += 1
+        return computed
+
+    def frequent_roots(self, top: int = 10) -> list[str]:
+        """The *top* most frequently exploded single roots, most requested first."""
+        with self._requests_lock:
+            common = self._requests.most_common(top)
+        return [self.part_ids[code] for code, _ in common]
+
+    def closure_stats(self, top: int = 10) -> dict:
+        """Hit/miss statistics of the closure cache and the most requested roots."""
+        stats = self.closure_cache.stats() if self.closure_cache is not None else {}
+        stats["version"] = self.version
+        with self._requests_lock:
+            common = self._requests.most_common(top)
+        stats["top_roots"] = [(self.part_ids[code], n) for code, n in common]
+        return stats
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _model_mask(self, car_model: CarModels) -> Optional[np.ndarray]:
+        """Boolean lookup table over car-model codes, or None when not filtering."""
+        if car_model is None:
+            return None
+        if isinstance(car_model, str):
+            car_model = [car_model]
+        mask = np.zeros(len(self.car_models) + 1, dtype=bool)
+        codes = self.car_models.get_indexer(list(car_model))
+        mask[codes[codes >= 0]] = True
+        return mask  # the extra last slot keeps rows with a missing car model (code -1) excluded
+
+    def _cache_key(self, direction: str, roots: np.ndarray, max_depth: Optional[int], car_model: CarModels):
+        if car_model is not None:
+            car_model = (car_model,) if isinstance(car_model, str) else tuple(sorted(car_model))
+        return (self.version, direction, tuple(roots.tolist()), max_depth, car_model)
+
+    def _closure(
+        self, direction: str, roots: np.ndarray, max_depth: Optional[int], car_model: CarModels
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Memoized `_traverse`: exact hit, else slice of a cached unlimited explosion, else compute."""
+        csr = self.down if direction == "down" else self.up
+        if self.closure_cache is None:
+            return self._traverse(csr, roots, max_depth, car_model)
+
+        if direction == "down" and roots.size == 1:
+            with self._requests_lock:
+                self._requests[int(roots[0])] += 1
+
+        key = self._cache_key(direction, roots, max_depth, car_model)
+        cached = self.closure_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if max_depth is not None:
+            # Not counted as a lookup: the exact-key miss above already was
+            full = self.closure_cache.peek(self._cache_key(direction, roots, None, car_model))
+            if full is not None:
+                edges, levels = full
+                # Edges are emitted level by level, so a depth limit is a prefix
+                end = int(np.searchsorted(levels, max_depth, side="right"))
+                return edges[:end], levels[:end]
+
+        result = self._traverse(csr, roots, max_depth, car_model)
+        self.closure_cache.put(key, result)
+        return result
+
+    def _traverse(
+        self, csr: _CSR, roots: np.ndarray, max_depth: Optional[int], car_model: CarModels
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Breadth-first walk from *roots*; returns (edge rows, level of each edge)."""
+        model_mask = self._model_mask(car_model)
+        visited = np.zeros(self.num_parts, dtype=bool)
+        visited[roots] = True
+
+        frontier, level = roots, 1
+        edge_chunks, level_chunks = [], []
+        while frontier.size and (max_depth is None or level <= max_depth):
+            neighbours, edges = csr.gather(frontier)
+            if model_mask is not None:
+                keep = model_mask[self._edge_model[edges]]
+                neighbours, edges = neighbours[keep], edges[keep]
+
+            edge_chunks.append(edges)
+            level_chunks.append(np.full(edges.size, level, dtype=np.int32))
+
+            # Shared sub-assemblies are reported under every parent but expanded only once
+            frontier = np.unique(neighbours[~visited[neighbours]])
+            visited[frontier] = True
+            level += 1
+
+        if not edge_chunks:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty.astype(np.int32)
+        return np.concatenate(edge_chunks), np.concatenate(level_chunks)
+
+    def _frame(self, edges: np.ndarray, levels: np.ndarray) -> pd.DataFrame:
+        frame = self.df.iloc[edges]
+        return frame.assign(level=levels)[["level", *self.df.columns]]
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from spec.utils.bom import BOMGraph
+
+__all__ = ["BOMDiff", "diff_bom", "bom_scope"]
+
+EDGE_KEY = ("part_id", "child_part_id")
+# Not `bom_line_number`: it is the position of the line in its file, different across models and revisions
+COMPARE_COLUMNS = ("group_type", "group_revision_status", "is_software")
+
+
+@dataclass
+class BOMDiff:
+    """
+    Result of `diff_bom`.
+
+    Attributes:
+        added (pd.DataFrame): Edges only on the right side (full BOM rows).
+        removed (pd.DataFrame): Edges only on the left side (full BOM rows).
+        changed (pd.DataFrame): Edges on both sides whose compared columns differ, as the edge key
+            plus `<column>_<left label>` / `<column>_<right label>` for every changed column.
+        subtrees (pd.DataFrame): Per assembly (`part_id`), the number of its direct child edges
+            added, removed and changed, most changed first.
+    """
+
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    changed: pd.DataFrame
+    labels: tuple[str, str] = ("left", "right")
+    left_edges: int = 0
+    right_edges: int = 0
+    changed_columns: dict[str, int] = field(default_factory=dict)
+    subtrees: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    def iter_summary(self, by: str = "group_type", top: int = 10) -> Iterator[str]:
+        """Yield the summary of the (already computed) diff line by line."""
+        left, right = self.labels
+        yield f"BOM diff {left} → {right}: {self.left_edges} → {self.right_edges} edges"
+        yield f"Added: {len(self.added)}, removed: {len(self.removed)}, changed: {len(self.changed)}"
+        for column, count in self.changed_columns.items():
+            yield f"  {column} changed on {count} edges"
+
+        for name, frame in (("Added", self.added), ("Removed", self.removed)):
+            if frame.empty or by not in frame.columns:
+                continue
+            counts = frame[by].value_counts(dropna=False).head(top)
+            yield f"{name} by {by}: " + ", ".join(f"{k}: {v}" for k, v in counts.items())
+
+        for name, frame, column in (("Added", self.added, EDGE_KEY[0]), ("Removed", self.removed, EDGE_KEY[0])):
+            if frame.empty:
+                continue
+            counts = frame[column].value_counts()
+            counts = counts[counts > 0].head(top)  # categorical columns also count unused categories
+            yield f"{name} most under: " + ", ".join(f"{k} ({v})" for k, v in counts.items())
+
+        if not self.subtrees.empty:
+            yield "Most changed assemblies: " + ", ".join(
+                f"{row.part_id} (+{row.added} -{row.removed} ~{row.changed})"
+                for row in self.subtrees.head(top).itertuples(index=False)
+            )
+
+    def summary(self, by: str = "group_type", top: int = 10) -> str:
+        return "\n".join(self.iter_summary(by=by, top=top))
+
+
+def _edge_hash(df: pd.DataFrame, key: Sequence[str]) -> np.ndarray:
+    # Value based, so categorical and string columns of the two sides hash alike
+    return pd.util.hash_pandas_object(df[list(key)], index=False, categorize=True).to_numpy()
+
+
+def _differs(a: pd.Series, b: pd.Series) -> np.ndarray:
+    left, right = a.to_numpy(dtype=object), b.to_numpy(dtype=object)
+    both_missing = pd.isna(left) & pd.isna(right)
+    return (left != right) & ~both_missing
+
+
+def _subtrees(added: pd.DataFrame, removed: pd.DataFrame, changed: pd.DataFrame, parent: str) -> pd.DataFrame:
+    counts = pd.DataFrame({
+        name: frame[parent].astype(object).value_counts()
+        for name, frame in (("added", added), ("removed", removed), ("changed", changed))
+    }).fillna(0).astype(np.int64)
+    if counts.empty:
+        return pd.DataFrame(columns=[parent, "added", "removed", "changed", "total"])
+    counts["total"] = counts.sum(axis=1)
+    counts = counts.sort_values("total", ascending=False, kind="stable")
+    return counts.rename_axis(parent).reset_index()
+
+
+def diff_bom(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    key: Sequence[str] = EDGE_KEY,
+    compare: Iterable[str] = COMPARE_COLUMNS,
+    labels: tuple[str, str] = ("left", "right"),
+) -> BOMDiff:
+    """
+    Diff two sets of BOM edges.
+
+    Edges are matched on 64-bit hashes of their *key* columns: added/removed
+    edges come from a sorted membership test of the hash arrays, and the common
+    edges of both sides are aligned by sorting on the hash, so every compared
+    column is checked in one vectorized pass. When an edge appears on several
+    BOM lines, the first line of each side is compared.
+    """
+    key = list(key)
+    compare = [c for c in compare if c in left.columns and c in right.columns and c not in key]
+
+    left_hash, right_hash = _edge_hash(left, key), _edge_hash(right, key)
+    in_right = np.isin(left_hash, right_hash)
+    in_left = np.isin(right_hash, left_hash)
+
+    # One row per edge on each side, ordered by hash → both sides line up row by row
+    _, left_first = np.unique(left_hash[in_right], return_index=True)
+    _, right_first = np.unique(right_hash[in_left], return_index=True)
+    common_left = left[in_right].iloc[left_first]
+    common_right = right[in_left].iloc[right_first]
+
+    changed_any = np.zeros(len(common_left), dtype=bool)
+    masks = {}
+    for column in compare:
+        masks[column] = _differs(common_left[column], common_right[column])
+        changed_any |= masks[column]
+
+    left_label, right_label = labels
+    changed = common_left.loc[:, key][changed_any].reset_index(drop=True)
+    changed_columns = {}
+    for column, mask in masks.items():
+        if mask.any():
+            changed_columns[column] = int(mask.sum())
+            changed[f"{column}_{left_label}"] = common_left[column].to_numpy()[changed_any]
+            changed[f"{column}_{right_label}"] = common_right[column].to_numpy()[changed_any]
+
+    added, removed = right[~in_left], left[~in_right]
+    return BOMDiff(
+        added=added,
+        removed=removed,
+        changed=changed,
+        labels=labels,
+        left_edges=len(left),
+        right_edges=len(right),
+        changed_columns=changed_columns,
+        subtrees=_subtrees(added, removed, changed, key[0]),
+    )
+
+
+def bom_scope(
+    df: pd.DataFrame,
+    graph: Optional[BOMGraph] = None,
+    part_ids: Optional[Iterable[str]] = None,
+    max_depth: Optional[int] = None,
+    **filters,
+) -> pd.DataFrame:
+    """
+    One side of a diff: the subtree below *part_ids* (or the whole *df*),
+    restricted to rows matching every column filter, e.g. `car_model="VF8"` or
+    `group_id="G1", group_revision_status="Released"`.
+    """
+    if part_ids:
+        scope = graph.explode(part_ids, max_depth=max_depth, car_model=filters.get("car_model"))
+    else:
+        scope = df
+    for column, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            scope = scope[scope[column].isin(value)]
+        else:
+            scope = scope[scope[column] == value]
+    return scope
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import Iterable, Optional
+
+import pandas as pd
+
+__all__ = ["BOMSQLEngine"]
+
+
+class BOMSQLEngine:
+    """
+    Embedded DuckDB engine over the BOM edge list.
+
+        • the BOM is loaded once into a columnar `bom` table (from `BOM_df`
+          or from a Parquet snapshot of it)
+        • multi-threaded aggregation and joins (DuckDB `threads` setting)
+        • recursive CTE helpers for hierarchy queries
+        • read‑only `run()` with the same discipline as `SQLNotebook.run`
+        • file system access is disabled and the configuration locked once the
+          data is loaded, so user SQL cannot read or write other files
+
+    Every query runs on its own cursor, so the engine can be shared by the
+    notebook and concurrent API requests.
+
+    Usage:
+        engine = BOMSQLEngine(BOM_df, threads=4)
+        engine.run("SELECT car_model, count(*) FROM bom GROUP BY ALL")
+        engine.explode(["BAT00001"], max_depth=3)
+    """
+
+    # ───────────────────────────── class‑level helpers ──────────────────────────
+    _READONLY_OK_RE = re.compile(
+        r"^\s*(?:WITH\b.*?SELECT|SELECT|FROM)\b", re.IGNORECASE | re.DOTALL
+    )
+    _DANGEROUS_RE = re.compile(
+        r"\b(INSERT|UPDATE|DELETE|MERGE|ALTER|DROP|TRUNCATE|GRANT|REVOKE|COPY|"
+        r"CREATE|ATTACH|DETACH|INSTALL|LOAD|EXPORT|IMPORT|PRAGMA|SET|RESET|CALL|CHECKPOINT)\b",
+        re.IGNORECASE,
+    )
+    TABLE = "bom"
+
+    # ───────────────────────────── constructor ─────────────────────────────────
+    def __init__(
+        self,
+        df: Optional[pd.DataFrame] = None,
+        *,
+        parquet: Optional[str] = None,
+        threads: Optional[int] = None,
+        max_depth: int = 64,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        df        : the BOM DataFrame to load; ignored when *parquet* exists.
+        parquet   : path of a Parquet snapshot of the BOM (see `snapshot()`).
+        threads   : DuckDB worker threads; defaults to the number of CPUs.
+        max_depth : level cap of the recursive helpers, guards against cycles.
+        """
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError(
+                "BOMSQLEngine requires the optional 'duckdb' package: pip install duckdb"
+            ) from e
+
+        if df is None and not (parquet and os.path.exists(parquet)):
+            raise ValueError("Provide a BOM DataFrame or an existing Parquet snapshot.")
+
+        self.max_depth = max_depth
+        self._conn = duckdb.connect(":memory:")
+        self._conn.execute(f"SET threads TO {int(threads or os.cpu_count() or 1)}")
+
+        if parquet and os.path.exists(parquet):
+            self._conn.execute(
+                f"CREATE TABLE {self.TABLE} AS SELECT * FROM read_parquet(?)", [parquet]
+            )
+        else:
+            self._conn.register("_bom_df", df)
+            self._conn.execute(f"CREATE TABLE {self.TABLE} AS SELECT * FROM _bom_df")
+            self._conn.unregister("_bom_df")
+
+        self._conn.execute("SET enable_external_access = false")
+        self._conn.execute("SET lock_configuration = true")
+
+    # ───────────────────────────── public API ──────────────────────────────────
+    def run(self, sql: str, params: Optional[list | dict] = None) -> pd.DataFrame:
+        """
+        Execute *sql* strictly in **read‑only** mode against the `bom` table.
+
+        Rules
+        -----
+        1. Exactly one statement starting with `SELECT`, `FROM` or `WITH … SELECT`.
+        2. Any violation of (1) raises `PermissionError`.
+
+        Returns
+        -------
+        pandas.DataFrame with the query result.
+        """
+        statement = sql.strip().rstrip(";")
+        if (
+            not self._READONLY_OK_RE.match(statement)
+            or self._DANGEROUS_RE.search(statement)
+            or ";" in statement
+        ):
+            raise PermissionError(
+                "Only a single pure SELECT statement is allowed in run()."
+            )
+        return self._fetch(statement, params)
+
+    def explode(
+        self,
+        part_ids: Iterable[str],
+        max_depth: Optional[int] = None,
+        car_model: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Multi-level explosion below *part_ids* as a recursive CTE."""
+        return self._recursive("part_id", "child_part_id", part_ids, max_depth, car_model)
+
+    def where_used(
+        self,
+        part_ids: Iterable[str],
+        max_depth: Optional[int] = None,
+        car_model: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Reverse explosion above *part_ids* as a recursive CTE."""
+        return self._recursive("child_part_id", "part_id", part_ids, max_depth, car_model)
+
+    def snapshot(self, path: str) -> None:
+        """Write the `bom` table to a Parquet snapshot for faster engine startup."""
+        # External access is locked off, so export through pandas/pyarrow
+        self._fetch(f"SELECT * FROM {self.TABLE}").to_parquet(path, index=False)
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _recursive(
+        self,
+        start_col: str,
+        next_col: str,
+        part_ids: Iterable[str],
+        max_depth: Optional[int],
+        car_model: Optional[str],
+    ) -> pd.DataFrame:
+        if isinstance(part_ids, str):
+            part_ids = [part_ids]
+        model_filter = "AND b.car_model = $car_model" if car_model is not None else ""
+        # `reach` holds (part, depth) pairs, so a shared sub-assembly is listed once per depth
+        # rather than once per path. Each part is then expanded once, from the shallowest
+        # depth it was reached at, as BOMGraph does
+        sql = f"""
+            WITH RECURSIVE reach AS (
+                SELECT unnest($part_ids) AS node, 0 AS depth
+                UNION
+                SELECT b.{next_col} AS node, r.depth + 1 AS depth
+                FROM {self.TABLE} b
+                JOIN reach r ON b.{start_col} = r.node
+                WHERE r.depth + 1 < $max_depth {model_filter}
+            ),
+            first AS (
+                SELECT node, min(depth) AS depth FROM reach GROUP BY node
+            )
+            SELECT f.depth + 1 AS level, b.*
+            FROM first f
+            JOIN {self.TABLE} b ON b.{start_col} = f.node
+            WHERE f.depth < $max_depth {model_filter}
+            ORDER BY level
+        """
+        depth = self.max_depth if max_depth is None else min(max_depth, self.max_depth)
+        params = {"part_ids": list(part_ids), "max_depth": depth}
+        if car_model is not None:
+            params["car_model"] = car_model
+        return self._fetch(sql, params)
+
+    def _fetch(self, sql: str, params: Optional[list | dict] = None) -> pd.DataFrame:
+        cur = self._conn.cursor()
+        try:
+            return cur.execute(sql, params).df()
+        finally:
+            cur.close()
+
+    # ───────────────────────────── tear‑down ───────────────────────────────────
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import ast
+import builtins
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from spec.utils.code_analysis import analyze_code
+from spec.utils.lru import LRUCache
+from spec.utils.notebook import NotebookCellOutput
+
+__all__ = ["CellAnalysis", "CellCache", "analyze_cell"]
+
+# Methods that mutate their object, write files, draw, or are not deterministic
+_IMPURE_METHODS = {
+    "append", "extend", "insert", "pop", "popitem", "remove", "clear", "update", "setdefault",
+    "sort", "reverse", "add", "discard",
+    "to_csv", "to_parquet", "to_excel", "to_pickle", "to_json", "to_sql", "savefig",
+    "plot", "hist", "bar", "barh", "scatter", "pie", "boxplot", "show", "figure", "subplots",
+    "random", "rand", "randn", "randint", "choice", "sample", "shuffle", "permutation",
+    "now", "today", "time", "uuid4",
+    # I/O: the result depends on files, the network or the environment
+    "read_csv", "read_excel", "read_parquet", "read_json", "read_sql", "read_sql_query", "read_table",
+    "read_pickle", "read_feather", "read_hdf", "read_html", "read_fwf", "read_clipboard",
+    "load", "loadtxt", "genfromtxt", "fromfile", "save", "savez", "savetxt", "tofile",
+    "listdir", "scandir", "walk", "glob", "system", "popen", "urlopen", "getenv",
+}
+# Methods that change their object in place. Calls of any other method are reads
+# (`inplace=True` calls and item/attribute assignments are caught separately)
+_MUTATING_METHODS = {
+    "append", "extend", "insert", "pop", "popitem", "remove", "clear", "update", "setdefault",
+    "sort", "reverse", "add", "discard", "fill", "put", "resize", "itemset", "setflags",
+    "__setitem__", "__delitem__", "__setattr__", "__delattr__", "__iadd__", "__isub__",
+}
+# Builtins that reach into the namespace, the file system or the user
+_IMPURE_BUILTINS = {
+    "exec", "eval", "compile", "open", "input", "globals", "locals", "vars",
+    "setattr", "delattr", "__import__", "breakpoint",
+}
+_BINDING_NODES = (
+    ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Delete, ast.For, ast.AsyncFor, ast.With,
+    ast.AsyncWith, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Global, ast.Nonlocal,
+    ast.NamedExpr, ast.Try, ast.Match,
+)
+_CACHEABLE_TYPES = (pd.DataFrame, pd.Series, pd.Index, np.ndarray, np.generic, str, int, float, bool, type(None))
+
+
+@dataclass
+class CellAnalysis:
+    """What `CellCache` needs to know about a cell, from one parse of its source."""
+
+    key: Optional[str]  # hash of the normalized AST, None if the cell does not parse
+    pure: bool = False
+    reads: set[str] = field(default_factory=set)
+    binds: set[str] = field(default_factory=set)  # names the cell (re)binds in the namespace
+    local: set[str] = field(default_factory=set)  # comprehension variables and lambda/function arguments
+    imports: str = ""  # the import statements, re-run on a cache hit
+    opaque: bool = False  # the cell can bind names we cannot see (exec, globals(), ...)
+    mutates: set[str] = field(default_factory=set)  # names whose object the cell may change in place
+
+
+class _Scopes(ast.NodeVisitor):
+    """Splits the stored names of a cell into namespace bindings and names local to comprehensions/lambdas."""
+
+    def __init__(self):
+        self.binds: set[str] = set()
+        self.local: set[str] = set()
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, (ast.Store, ast.Del)):
+            self.binds.add(node.id)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr):
+        # `:=` binds in the enclosing scope, even inside a comprehension
+        self.binds.add(node.target.id)
+        self.visit(node.value)
+
+    def visit_Import(self, node: ast.Import | ast.ImportFrom):
+        self.binds.update((a.asname or a.name).split(".")[0] for a in node.names)
+
+    visit_ImportFrom = visit_Import
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.name:
+            self.binds.add(node.name)
+        self.generic_visit(node)
+
+    def _function(self, node):
+        if not isinstance(node, ast.Lambda):
+            self.binds.add(node.name)
+            for decorator in node.decorator_list:
+                self.visit(decorator)
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(default)
+        args = node.args
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [a for a in (args.vararg, args.kwarg) if a]:
+            self.local.add(arg.arg)
+        body = node.body if isinstance(node.body, list) else [node.body]
+        for stmt in body:
+            for inner in ast.walk(stmt):
+                if isinstance(inner, ast.Global):
+                    self.binds.update(inner.names)
+                elif isinstance(inner, ast.Name):
+                    self.local.add(inner.id)
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _function
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self.binds.add(node.name)
+        self.generic_visit(node)
+
+    def _comprehension(self, node):
+        for generator in node.generators:
+            for target in ast.walk(generator.target):
+                if isinstance(target, ast.Name):
+                    self.local.add(target.id)
+            self.visit(generator.iter)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for part in ("elt", "key", "value"):
+            if hasattr(node, part):
+                self.visit(getattr(node, part))
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _comprehension
+
+
+def _base_name(node: ast.AST) -> Optional[str]:
+    """`df` for `df`, `df["x"]`, `df.attr`, `df.loc[...]` and `df.x.y(...)`."""
+    while isinstance(node, (ast.Subscript, ast.Attribute, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _mutated(tree: ast.AST) -> set[str]:
+    """
+    Names whose object *tree* may change without rebinding them: item and
+    attribute assignments and deletions, `setattr`/`delattr`, `inplace=True`
+    calls and calls of known mutating methods (`append`, `update`, ...).
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(_base_name(node.value))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            inplace = any(
+                kw.arg == "inplace" and not (isinstance(kw.value, ast.Constant) and kw.value.value is False)
+                for kw in node.keywords
+            )
+            if inplace or node.func.attr in _MUTATING_METHODS:
+                names.add(_base_name(node.func.value))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ("setattr", "delattr"):
+            if node.args:
+                names.add(_base_name(node.args[0]))
+    names.discard(None)
+    return names
+
+
+def _scopes(tree: ast.AST) -> _Scopes:
+    scopes = _Scopes()
+    scopes.visit(tree)
+    return scopes
+
+
+@lru_cache(maxsize=1024)
+def analyze_cell(code: str) -> CellAnalysis:
+    """
+    Decide whether *code* is a pure cell.
+
+    Pure cells consist of expressions and imports only: they bind no names
+    in the namespace, call no mutating/drawing/random/I-O methods, pass no
+    `inplace=True` and use none of the namespace or file builtins. Their
+    output depends only on the names they read.
+    """
+    code_analysis = analyze_code(code)
+    tree, key = code_analysis.tree, code_analysis.key
+    if tree is None or key is None:
+        return CellAnalysis(key=None)
+
+    scopes = _scopes(tree)
+    reads = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+    pure, opaque = True, False
+    for node in ast.walk(tree):
+        if isinstance(node, _BINDING_NODES) or isinstance(node, (ast.Await, ast.Yield, ast.YieldFrom)):
+            pure = False
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in _IMPURE_BUILTINS:
+                pure, opaque = False, True
+            elif isinstance(func, ast.Attribute) and func.attr in _IMPURE_METHODS:
+                pure = False
+            if any(
+                kw.arg == "inplace" and not (isinstance(kw.value, ast.Constant) and kw.value.value is False)
+                for kw in node.keywords
+            ):
+                pure = False
+
+    imports = [stmt for stmt in tree.body if isinstance(stmt, (ast.Import, ast.ImportFrom))]
+    return CellAnalysis(
+        key=key,
+        pure=pure,
+        reads=reads,
+        binds=scopes.binds,
+        local=scopes.local,
+        imports="\n".join(ast.unparse(stmt) for stmt in imports),
+        opaque=opaque,
+        mutates=_mutated(tree) - scopes.local,
+    )
+
+
+def _cacheable(value: Any) -> bool:
+    if isinstance(value, (tuple, list)):
+        return all(isinstance(v, _CACHEABLE_TYPES) for v in value)
+    return isinstance(value, _CACHEABLE_TYPES)
+
+
+def _sizeof(output: NotebookCellOutput) -> int:
+    size = sys.getsizeof(output.console)
+    for value in output.vars:
+        if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = value.memory_usage(deep=True)
+            size += int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+        elif isinstance(value, np.ndarray):
+            size += value.nbytes
+        else:
+            size += sys.getsizeof(value)
+    return size
+
+
+class CellCache:
+    """
+    Result cache of pure notebook cells, shared by all sessions.
+
+        • key = hash of the normalized AST (formatting and comments do not
+          matter) + the BOM data version, so a BOM reload invalidates it
+        • only pure cells (see `analyze_cell`) that read nothing but the
+          shared notebook globals (`stable_names`), builtins and their own
+          imports are cached; a name the session has rebound (e.g.
+          `BOM_df = BOM_df[...]`) or may have changed in place (e.g.
+          `BOM_df["x"] = 1`, `BOM_df.drop(..., inplace=True)`) makes every
+          cell reading it uncacheable for that session
+        • cells that failed, hit a limit or returned figures are not cached
+        • size-bounded LRU eviction
+
+    Usage:
+        cell_cache = CellCache({"BOM_df", "bom_graph", "pd"}, max_bytes=256 * 1024**2, modules={"pd"})
+        output = cell_cache.get(session_id, code, version)
+        if output is None:
+            output = notebook.exec(code)
+            cell_cache.put(session_id, code, version, output)
+    """
+
+    def __init__(
+        self,
+        stable_names: Iterable[str],
+        max_bytes: Optional[int] = None,
+        max_sessions: int = 10000,
+        modules: Iterable[str] = (),
+    ):
+        self.stable_names = set(stable_names) | set(dir(builtins))
+        # Shared names bound to modules: calling their functions changes nothing
+        self.modules = set(modules)
+        self._results = LRUCache(max_bytes=max_bytes)
+        # Names each session has bound itself; "*" = unknown bindings, nothing is cacheable
+        self._tainted = LRUCache(max_items=max_sessions)
+
+    def analyze(self, code: str) -> CellAnalysis:
+        return analyze_cell(code)
+
+    def get(self, session_id: str, code: str, version: Any) -> Optional[NotebookCellOutput]:
+        """The cached output of *code*, or None if it is not cacheable here or not cached yet."""
+        analysis = self.analyze(code)
+        if not self._usable(session_id, analysis):
+            return None
+        return self._results.get((analysis.key, version))
+
+    def put(self, session_id: str, code: str, version: Any, output: NotebookCellOutput) -> bool:
+        """Record what *code* bound in the session and cache its output if the cell is pure."""
+        analysis = self.analyze(code)
+        tainted = self._tainted.get(session_id) or set()
+        if analysis.opaque or analysis.key is None:
+            tainted = tainted | {"*"}
+        # Imported module names are stable; anything else the cell binds or changes is session state
+        imported = self._imported(analysis)
+        tainted = tainted | (analysis.binds - imported) | (analysis.mutates - imported - self.modules)
+        if tainted:
+            self._tainted.put(session_id, tainted, size=0)
+
+        if (
+            not self._usable(session_id, analysis)
+            or output.error
+            # The notebook reports exceptions as "Error: ..." lines
+            or "Error: " in output.console
+            or not all(_cacheable(v) for v in output.vars)
+        ):
+            return False
+        return self._results.put((analysis.key, version), output, size=_sizeof(output))
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def stats(self) -> dict:
+        return self._results.stats()
+
+    def _imported(self, analysis: CellAnalysis) -> set[str]:
+        if not analysis.imports:
+            return set()
+        return _scopes(ast.parse(analysis.imports)).binds
+
+    def _usable(self, session_id: str, analysis: CellAnalysis) -> bool:
+        if not analysis.pure or analysis.key is None:
+            return False
+        tainted = self._tainted.get(session_id) or set()
+        if "*" in tainted:
+            return False
+        allowed = self.stable_names | self._imported(analysis) | analysis.local
+        return analysis.reads <= allowed and not (analysis.reads & tainted)
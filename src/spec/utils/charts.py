@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import threading
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from spec.config import settings
+
+__all__ = ["ChartRenderer", "RenderedChart", "chart_renderer"]
+
+MIME_TYPES = {"png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+
+
+@dataclass(frozen=True)
+class RenderedChart:
+    """An encoded chart image, ready to be streamed or displayed."""
+
+    data: bytes
+    mime: str
+    width: int
+    height: int
+
+    def b64(self) -> str:
+        return b64encode(self.data).decode()
+
+    def data_uri(self) -> str:
+        return f"data:{self.mime};base64,{self.b64()}"
+
+    def _repr_html_(self) -> str:
+        # Lets Streamlit's st.write / write_stream display the chart as is
+        return f'<img src="{self.data_uri()}" style="max-width:100%;height:auto"/>'
+
+
+class ChartRenderer:
+    """
+    Renders matplotlib figures and PIL images into compact encoded images.
+
+        • the resolution is capped: `dpi`, lowered so that neither side
+          exceeds `max_px` pixels
+        • `png`, `webp` (lossy, `quality`) or `svg` output
+        • `arender()` renders on a small thread pool, so the event loop keeps
+          streaming while a chart is drawn and encoded
+
+    Usage:
+        renderer = ChartRenderer(dpi=100, max_px=1600, fmt="webp")
+        chart = await renderer.arender(fig)
+        chart.mime, len(chart.data)
+    """
+
+    def __init__(self, dpi: int = 100, max_px: int = 1600, fmt: str = "png", quality: int = 80, workers: int = 2):
+        if fmt not in MIME_TYPES:
+            raise ValueError(f"Unsupported chart format '{fmt}', use one of {', '.join(MIME_TYPES)}")
+        self.dpi = dpi
+        self.max_px = max_px
+        self.fmt = fmt
+        self.quality = quality
+        self.workers = workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def render(self, obj: Any) -> RenderedChart:
+        """Encode a matplotlib Figure or PIL Image (blocking)."""
+        from matplotlib.figure import Figure
+        from PIL import Image
+
+        if isinstance(obj, Figure):
+            return self._render_figure(obj)
+        if isinstance(obj, Image.Image):
+            return self._render_image(obj)
+        raise TypeError(f"Cannot render {type(obj).__name__} as a chart")
+
+    async def arender(self, obj: Any) -> RenderedChart:
+        """`render` on the renderer's thread pool."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chart")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.render, obj)
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _render_figure(self, fig) -> RenderedChart:
+        from PIL import Image
+
+        width_in, height_in = fig.get_size_inches()
+        dpi = min(self.dpi, self.max_px / max(width_in, height_in, 1e-6))
+        if self.fmt == "svg":
+            buf = io.BytesIO()
+            fig.savefig(buf, format="svg", bbox_inches="tight")
+            return RenderedChart(buf.getvalue(), MIME_TYPES["svg"], int(width_in * dpi), int(height_in * dpi))
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+        if self.fmt == "png":
+            with Image.open(io.BytesIO(buf.getvalue())) as image:
+                size = image.size
+            return RenderedChart(buf.getvalue(), MIME_TYPES["png"], *size)
+
+        buf.seek(0)
+        with Image.open(buf) as image:
+            return self._encode(image)
+
+    def _render_image(self, image) -> RenderedChart:
+        if max(image.size) > self.max_px:
+            image = image.copy()
+            image.thumbnail((self.max_px, self.max_px))
+        return self._encode(image)
+
+    def _encode(self, image) -> RenderedChart:
+        fmt = "png" if self.fmt == "svg" else self.fmt  # raster images stay raster
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        buf = io.BytesIO()
+        if fmt == "webp":
+            image.save(buf, format="WEBP", quality=self.quality, method=4)
+        else:
+            image.save(buf, format="PNG", optimize=True)
+        return RenderedChart(buf.getvalue(), MIME_TYPES[fmt], *image.size)
+
+
+chart_renderer = ChartRenderer(
+    dpi=settings.chart_dpi,
+    max_px=settings.chart_max_px,
+    fmt=settings.chart_format,
+    quality=settings.chart_quality,
+    workers=settings.chart_workers,
+)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import ast
+import copy
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from types import CodeType
+from typing import Optional, Tuple
+
+from .guardrail import detect_suspicious_code
+
+__all__ = ["CodeAnalysis", "analyze_code"]
+
+FILENAME = "<cell>"
+
+
+@dataclass(frozen=True)
+class CodeAnalysis:
+    """
+    Everything derived from the source of one cell, computed in a single pass.
+
+    Attributes:
+        tree (Optional[ast.Module]): The parsed cell, None on a syntax error.
+        key (Optional[str]): Hash of the normalized AST (formatting and comments ignored).
+        findings (Tuple[str, ...]): Guardrail findings, see `detect_suspicious_code`.
+        imports (Tuple[str, ...]): Fully qualified names of the imported modules.
+        body_code (Optional[CodeType]): All statements but the last, compiled.
+        last_expr_code (Optional[CodeType]): The last statement compiled in eval mode, if it is an expression.
+        last_code (Optional[CodeType]): The last statement compiled in exec mode, if it is not.
+        syntax_error (Optional[SyntaxError]): Why the cell could not be parsed or compiled.
+    """
+
+    tree: Optional[ast.Module]
+    key: Optional[str] = None
+    findings: Tuple[str, ...] = ()
+    imports: Tuple[str, ...] = ()
+    body_code: Optional[CodeType] = None
+    last_expr_code: Optional[CodeType] = None
+    last_code: Optional[CodeType] = None
+    syntax_error: Optional[SyntaxError] = None
+
+    def raise_syntax_error(self) -> None:
+        """
+        Raise `syntax_error`, if any, as a fresh copy: the cached instance
+        would otherwise gather a longer traceback on every run of the cell.
+        """
+        if self.syntax_error is not None:
+            raise copy.copy(self.syntax_error).with_traceback(None)
+
+
+def _imports(tree: ast.Module) -> Tuple[str, ...]:
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module is not None:
+            names.append(node.module)
+    return tuple(names)
+
+
+@lru_cache(maxsize=1024)
+def analyze_code(code: str) -> CodeAnalysis:
+    """
+    Parse *code* once and derive the guardrail findings, the imports and the
+    compiled code objects from that one tree. Results are cached by source,
+    so a re-submitted cell is neither parsed nor compiled again.
+
+    The split into body and last statement is done on the AST, so a last
+    expression spanning several lines is still returned as the cell result.
+    """
+    try:
+        tree = ast.parse(code, filename=FILENAME)
+    except SyntaxError as e:
+        return CodeAnalysis(tree=None, findings=tuple(detect_suspicious_code(code)), syntax_error=e)
+
+    dump = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    findings = tuple(detect_suspicious_code(code, tree=tree))
+
+    body_code = last_expr_code = last_code = None
+    try:
+        if tree.body:
+            *body, last = tree.body
+            if body:
+                body_code = compile(ast.Module(body=body, type_ignores=[]), FILENAME, "exec")
+            if isinstance(last, ast.Expr):
+                last_expr_code = compile(ast.Expression(body=last.value), FILENAME, "eval")
+            else:
+                last_code = compile(ast.Module(body=[last], type_ignores=[]), FILENAME, "exec")
+    except SyntaxError as e:
+        # e.g. `return` or `await` outside a function only fail at compile time
+        return CodeAnalysis(tree=tree, findings=findings, syntax_error=e)
+
+    return CodeAnalysis(
+        tree=tree,
+        key=hashlib.sha256(dump.encode()).hexdigest(),
+        findings=findings,
+        imports=_imports(tree),
+        body_code=body_code,
+        last_expr_code=last_expr_code,
+        last_code=last_code,
+    )
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from spec.config import logger, settings
+
+__all__ = ["ConversationLog", "LocalLogSink", "S3LogSink", "get_conversation_log", "loggable_content"]
+
+
+def loggable_content(content: Any) -> Any:
+    """
+    The content of a displayed message as it is logged: text as is, charts as
+    artifact references (the SHA-256 id `ArtifactStore` gives them, mime and
+    size) and tables as their shape and columns, never their bytes or repr.
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, (list, tuple)):
+        parts: List[Any] = []
+        for item in content:
+            part = loggable_content(item)
+            if isinstance(part, str) and parts and isinstance(parts[-1], str):
+                parts[-1] += part  # streamed text arrives in many small chunks
+            else:
+                parts.append(part)
+        return parts[0] if len(parts) == 1 and isinstance(parts[0], str) else parts
+    data, mime = getattr(content, "data", None), getattr(content, "mime", None)
+    if isinstance(data, bytes) and mime:
+        return {"kind": "artifact", "id": hashlib.sha256(data).hexdigest(), "mime": mime, "size": len(data)}
+    if hasattr(content, "shape") and hasattr(content, "columns"):
+        return {"kind": "dataframe", "rows": int(content.shape[0]), "columns": [str(c) for c in content.columns]}
+    if hasattr(content, "shape") and hasattr(content, "name"):
+        return {"kind": "series", "rows": int(content.shape[0]), "name": str(content.name)}
+    return {"kind": type(content).__name__}
+
+
+class LocalLogSink:
+    """Appends each batch to `<root>/<key>.jsonl`."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def write(self, key: str, data: bytes) -> None:
+        path = os.path.join(self.root, f"{key}.jsonl")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(data)
+
+
+class S3LogSink:
+    """
+    Writes each batch as a new segment `<key>/<ms timestamp>-<random>.jsonl`.
+
+    S3 objects cannot be appended to; listing the prefix in key order gives
+    the conversation in order.
+    """
+
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def write(self, key: str, data: bytes) -> None:
+        segment = f"{key}/{int(time.time() * 1000):013d}-{uuid4().hex[:8]}.jsonl"
+        self.s3.upload_bytes(data, segment, content_type="application/x-ndjson")
+
+
+class ConversationLog:
+    """
+    Write-behind, append-only log of conversations.
+
+        • `append()` only enqueues: the chat never waits for the upload
+        • callers pass the messages of the new turn only, so every message
+          is serialized and uploaded once over the whole session
+        • a background thread batches the queued messages per conversation
+          and writes them every `flush_interval` seconds or once
+          `max_batch_bytes` are pending, as JSON lines
+        • `close()` (also run at exit) writes what is still queued
+
+    Usage:
+        log = ConversationLog(LocalLogSink("logs"))
+        log.append(f"{folder}/{session_id}", [user_message, *new_items])
+    """
+
+    def __init__(self, sink, flush_interval: float = 5.0, max_batch_bytes: int = 1024**2):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.max_batch_bytes = max_batch_bytes
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, key: str, messages: List[Dict[str, Any]]) -> None:
+        if not messages or self._closed:
+            return
+        lines = "".join(json.dumps(m, ensure_ascii=False, default=str) + "\n" for m in messages)
+        self._queue.put((key, lines.encode("utf-8")))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until everything queued so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout: float = 30.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "failed": self.failed}
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _run(self) -> None:
+        batches: Dict[str, List[bytes]] = defaultdict(list)
+        pending = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ()
+
+            if isinstance(item, tuple) and item:
+                key, data = item
+                batches[key].append(data)
+                pending += len(data)
+                if pending < self.max_batch_bytes:
+                    continue
+
+            # Time's up, batch full, flush requested or closing
+            self._write(batches)
+            batches.clear()
+            pending = 0
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, batches: Dict[str, List[bytes]]) -> None:
+        for key, chunks in batches.items():
+            try:
+                self.sink.write(key, b"".join(chunks))
+                self.written += len(chunks)
+            except Exception as e:
+                self.failed += len(chunks)
+                logger.error(f"Failed to write conversation log '{key}': {e}")
+
+
+@lru_cache(maxsize=1)
+def get_conversation_log() -> ConversationLog:
+    """The process-wide log, writing to the sink selected by `settings.log_sink`."""
+    if settings.log_sink == "s3":
+        from spec.cache import cache
+
+        sink = S3LogSink(cache.s3)
+    elif settings.log_sink == "local":
+        sink = LocalLogSink(settings.log_dir)
+    else:
+        raise ValueError(f"Unknown log sink '{settings.log_sink}', use 's3' or 'local'")
+    return ConversationLog(sink, flush_interval=settings.log_flush_interval)
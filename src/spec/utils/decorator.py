@@ -3,6 +3,7 @@ import inspect
 import time
 
 from spec.config import logger
+from spec.utils.metrics import function_seconds
 
 
 def timeit(func):
@@ -16,7 +17,8 @@ def timeit(func):
         func (callable): The function to decorate.
 
     Returns:
-        The decorated function with execution time logging.
+        The decorated function with execution time logging; the time is also
+        recorded in the `spec_function_seconds` histogram.
 
     Usage:
         @timeit
@@ -36,6 +38,7 @@ def timeit(func):
                 logger.info(
                     f"Async [`{func.__name__.upper()}`] TOOK: {elapsed:.4f} seconds."
                 )
+                function_seconds.observe(elapsed, function=func.__qualname__)
 
         return async_wrapper
 
@@ -53,6 +56,7 @@ def timeit(func):
                 logger.info(
                     f"Async Generator [`{func.__name__.upper()}`] TOOK: {elapsed:.4f} seconds."
                 )
+                function_seconds.observe(elapsed, function=func.__qualname__)
 
         return async_gen_wrapper
 
@@ -69,6 +73,7 @@ def timeit(func):
                 logger.info(
                     f"Sync [`{func.__name__.upper()}`] TOOK: {elapsed:.4f} seconds."
                 )
+                function_seconds.observe(elapsed, function=func.__qualname__)
 
         return sync_wrapper
 
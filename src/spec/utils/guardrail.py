@@ -70,6 +70,10 @@ SUSPICIOUS_TEXT_PATTERNS = [
     r"ctypes",
     # Add more as desired...
 ]
+# All patterns in one regex, so the code is scanned once
+_SUSPICIOUS_TEXT_RE = re.compile(
+    "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(SUSPICIOUS_TEXT_PATTERNS))
+)
 
 class SecurityNodeVisitor(ast.NodeVisitor):
     """
@@ -119,16 +123,19 @@ class SecurityNodeVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 
-def detect_suspicious_code(code_str):
+def detect_suspicious_code(code_str, tree=None):
     """
     Analyze the input Python code string for suspicious imports, builtins,
     calls, and suspicious text patterns. Returns a list of findings.
+
+    Pass *tree* when the code has already been parsed (see `analyze_code`).
     """
     findings = []
 
     # 1. AST-based analysis
     try:
-        tree = ast.parse(code_str)
+        if tree is None:
+            tree = ast.parse(code_str)
         visitor = SecurityNodeVisitor()
         visitor.visit(tree)
         findings.extend(visitor.suspicious_findings)
@@ -136,9 +143,9 @@ def detect_suspicious_code(code_str):
         findings.append(f"Cannot parse code (syntax error): {e}")
 
     # 2. Naive string-based checks
-    for pattern in SUSPICIOUS_TEXT_PATTERNS:
-        matches = re.findall(pattern, code_str)
-        if matches:
+    matched = {m.lastgroup for m in _SUSPICIOUS_TEXT_RE.finditer(code_str)}
+    for i, pattern in enumerate(SUSPICIOUS_TEXT_PATTERNS):
+        if f"p{i}" in matched:
             findings.append(f"Code contains suspicious pattern: '{pattern}'")
 
     return findings
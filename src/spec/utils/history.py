@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import tiktoken
+
+from spec.config import logger, settings
+from spec.utils.lru import LRUCache
+
+__all__ = ["HistoryManager", "history_manager"]
+
+Item = Dict[str, Any]
+
+ELIDED_MARK = "[elided]"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The BPE file is downloaded on first use; without it, estimate
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+# Keyed by a digest of the text, so long tool outputs are not kept alive by the cache
+_token_counts = LRUCache(max_items=8192)
+
+
+def count_tokens(text: str) -> int:
+    key = (hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(), len(text))
+    count = _token_counts.get(key)
+    if count is None:
+        encoding = _encoding()
+        if encoding is None:
+            count = len(text) // 4 + 1
+        else:
+            count = len(encoding.encode(text, disallowed_special=()))
+        _token_counts.put(key, count)
+    return count
+
+
+def _item_text(item: Item) -> str:
+    if item.get("type") == "function_call_output":
+        output = item.get("output")
+        return output if isinstance(output, str) else json.dumps(output, default=str)
+    content = item.get("content")
+    if isinstance(content, str):
+        return content
+    if item.get("type") == "function_call":
+        return f"{item.get('name', '')}{item.get('arguments', '')}"
+    return json.dumps(content if content is not None else item, default=str)
+
+
+def item_tokens(item: Item) -> int:
+    # +4: role / item framing
+    return count_tokens(_item_text(item)) + 4
+
+
+def _turns(items: List[Item]) -> List[List[Item]]:
+    """Split the history at every user message; a leading non-user block is its own turn."""
+    turns: List[List[Item]] = []
+    for item in items:
+        if item.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(item)
+    return turns
+
+
+class HistoryManager:
+    """
+    Keeps the conversation sent to the agents under a token budget.
+
+        • the last `keep_turns` turns (a user message and everything the
+          agents did to answer it) are kept verbatim
+        • in older turns, tool outputs longer than `tool_output_tokens` are
+          replaced by their first lines and a note that the tool can be
+          called again: the specbook scans and tables of past questions are
+          what makes the history grow
+        • if the history is still over `budget_tokens`, the oldest turns are
+          dropped whole (a tool call is never separated from its output),
+          then the long tool outputs of the kept turns are elided as well
+
+    Only the input of each run is compacted: the stored history stays
+    complete, so a later, larger budget (or a shorter question) sees all of
+    it again. `keep_turns` counts the turns before the new message.
+
+    The items are those of `RunResult.to_input_list()`; the input list is
+    not modified.
+
+    Usage:
+        history = HistoryManager(budget_tokens=60000, keep_turns=3)
+        agent_input = history.agent_input(session.messages, message)
+        ...
+        session.messages += result.to_input_list()[len(agent_input) - 1:]  # the new message and what the run added
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 60000,
+        keep_turns: int = 3,
+        tool_output_tokens: int = 500,
+        head_chars: int = 600,
+    ):
+        self.budget_tokens = budget_tokens
+        self.keep_turns = keep_turns
+        self.tool_output_tokens = tool_output_tokens
+        self.head_chars = head_chars
+
+    def tokens(self, items: List[Item]) -> int:
+        return sum(item_tokens(item) for item in items)
+
+    def agent_input(self, history: List[Item], message: str) -> List[Item]:
+        """Input of a run: the compacted *history* (the turns before this one) and the new user *message*."""
+        return self.compact(history) + [{"role": "user", "content": message}]
+
+    def compact(self, items: List[Item]) -> List[Item]:
+        turns = _turns(items)
+        split = max(0, len(turns) - self.keep_turns)
+        old, recent = turns[:split], turns[split:]
+
+        old = [self._elide_turn(turn) for turn in old]
+        total = sum(self.tokens(turn) for turn in old + recent)
+        while old and total > self.budget_tokens:
+            total -= self.tokens(old.pop(0))
+        if total > self.budget_tokens:
+            recent = [self._elide_turn(turn) for turn in recent]
+
+        return [item for turn in old + recent for item in turn]
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _elide_turn(self, turn: List[Item]) -> List[Item]:
+        names = {item.get("call_id"): item.get("name") for item in turn if item.get("type") == "function_call"}
+        return [
+            self._elide(item, names.get(item.get("call_id"), "the tool"))
+            if item.get("type") == "function_call_output"
+            else item
+            for item in turn
+        ]
+
+    def _elide(self, item: Item, tool_name: str) -> Item:
+        text = _item_text(item)
+        if text.startswith(ELIDED_MARK):
+            return item
+        tokens = count_tokens(text)
+        if tokens <= self.tool_output_tokens:
+            return item
+        head = text[: self.head_chars]
+        if "\n" in head:
+            head = head.rsplit("\n", 1)[0]
+        note = (
+            f"{ELIDED_MARK} Output of `{tool_name}` from an earlier turn, {tokens} tokens, shortened to its beginning:\n"
+            f"{head}\n...\nCall `{tool_name}` again if the full result is needed."
+        )
+        return {**item, "output": note}
+
+
+history_manager = HistoryManager(
+    budget_tokens=settings.history_budget_tokens,
+    keep_turns=settings.history_keep_turns,
+    tool_output_tokens=settings.history_tool_output_tokens,
+)
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-import ast
-import base64
-import io
 import sys
 from dataclasses import dataclass, field
-from typing import Any, Iterable, List, Tuple
+from typing import Any, Iterable, List, Optional, Tuple
 
-from .guardrail import detect_suspicious_code
+import pandas as pd
+
+from .charts import ChartRenderer, chart_renderer
+from .code_analysis import CodeAnalysis, analyze_code
+from .results import frame_preview
+from .sandbox import (CellLimits, capture_stdout, check_result, run_limited,
+                      truncate_output)
 
 # Default list of allowed libraries. Only top level module names should be used.
 DEFAULT_ALLOWED_LIBRARIES = {
@@ -30,76 +33,69 @@ class InterpreterOutput:
 class CodeInterpreter:
     """Execute Python snippets in a restricted environment."""
 
-    def __init__(self, allowed_modules: Iterable[str] | None = None, env: dict[str, Any] | None = None):
+    def __init__(
+        self,
+        allowed_modules: Iterable[str] | None = None,
+        env: dict[str, Any] | None = None,
+        limits: Optional[CellLimits] = None,
+        renderer: Optional[ChartRenderer] = None,
+    ):
         self.allowed_modules = set(allowed_modules or DEFAULT_ALLOWED_LIBRARIES)
+        self.limits = limits
+        self.renderer = renderer or chart_renderer
         self.env = env or {"__builtins__": __builtins__}
         self.cells: List[Tuple[str, InterpreterOutput]] = []
 
     def exec(self, code: str) -> InterpreterOutput:
-        """Execute *code* and return console output, figures and last expression."""
-        findings = detect_suspicious_code(code)
-        if findings:
-            raise ValueError("Suspicious code detected: " + "; ".join(findings))
+        """
+        Execute *code* and return console output, figures and last expression.
+
+        Raises CellLimitExceeded when the cell overruns `limits`; printed output
+        beyond `limits.max_output_chars` is cut.
+        """
+        analysis = analyze_code(code)
+        if analysis.findings:
+            raise ValueError("Suspicious code detected: " + "; ".join(analysis.findings))
 
-        self._validate_imports(code)
-        buf = io.StringIO()
-        old_stdout = sys.stdout
-        sys.stdout = buf
-        result = None
-        try:
-            lines = [ln for ln in code.strip().splitlines() if ln.strip()]
-            if lines:
-                *body, last = lines
-                if body:
-                    exec("\n".join(body), self.env)
-                try:
-                    result = eval(last, self.env)
-                except Exception:
-                    exec(last, self.env)
-                    result = None
-                if result is not None:
-                    print(result)
-            else:
-                exec(code, self.env)
-        finally:
-            sys.stdout = old_stdout
+        self._validate_imports(analysis)
+        with capture_stdout() as buf:
+            result = run_limited(self._run, analysis, limits=self.limits)
+            check_result(result, self.limits)
+            if isinstance(result, (pd.DataFrame, pd.Series)):
+                print(frame_preview(result))
+            elif result is not None:
+                print(result)
 
+        console, _ = truncate_output(buf.getvalue(), self.limits)
         charts = self._extract_charts()
-        out = InterpreterOutput(console=buf.getvalue(), vars=(result,), charts=charts)
+        out = InterpreterOutput(console=console, vars=(result,), charts=charts)
         self.cells.append((code, out))
         return out
 
-    def _validate_imports(self, code: str) -> None:
-        """Raise ImportError if *code* imports modules outside the whitelist."""
-        try:
-            tree = ast.parse(code)
-        except SyntaxError:
-            # Let exec handle syntax errors
-            return
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    root = alias.name.split(".")[0]
-                    if root not in self.allowed_modules:
-                        raise ImportError(f"Import of '{alias.name}' is not allowed")
-            elif isinstance(node, ast.ImportFrom):
-                if node.module is None:
-                    continue
-                root = node.module.split(".")[0]
-                if root not in self.allowed_modules:
-                    raise ImportError(f"Import of '{node.module}' is not allowed")
+    def _run(self, analysis: CodeAnalysis) -> Any:
+        analysis.raise_syntax_error()
+        if analysis.body_code is not None:
+            exec(analysis.body_code, self.env)
+        if analysis.last_expr_code is not None:
+            return eval(analysis.last_expr_code, self.env)
+        if analysis.last_code is not None:
+            exec(analysis.last_code, self.env)
+        return None
+
+    def _validate_imports(self, analysis: CodeAnalysis) -> None:
+        """Raise ImportError if the cell imports modules outside the whitelist."""
+        for name in analysis.imports:
+            if name.split(".")[0] not in self.allowed_modules:
+                raise ImportError(f"Import of '{name}' is not allowed")
 
     def _extract_charts(self) -> List[str]:
-        """Return list of base64 encoded figures from matplotlib/plotly."""
+        """Return list of base64 encoded figures (in the renderer's format) from matplotlib, and plotly JSON."""
         charts: List[str] = []
         if "matplotlib.pyplot" in sys.modules:
             import matplotlib.pyplot as plt
             for num in plt.get_fignums():
                 fig = plt.figure(num)
-                b = io.BytesIO()
-                fig.savefig(b, format="png")
-                b.seek(0)
-                charts.append(base64.b64encode(b.read()).decode())
+                charts.append(self.renderer.render(fig).b64())
                 plt.close(fig)
         if "plotly" in sys.modules:
             try:
@@ -0,0 +1,525 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing import reduction
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional, Tuple
+
+from spec.config import logger
+from spec.utils.charts import chart_renderer
+from spec.utils.notebook import Notebook, NotebookCellOutput
+from spec.utils.sandbox import CellLimitExceeded, CellLimits, rss_bytes
+
+__all__ = ["Kernel", "KernelDied", "KernelPool"]
+
+
+class KernelDied(RuntimeError):
+    """The worker process of a kernel exited while (or before) running a cell."""
+
+
+def _warm_up():
+    # Import the heavy libraries once per worker, before any session is assigned
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+
+
+def _portable(obj: Any) -> Any:
+    """Figures are rendered in the worker; everything else travels as is (or as its repr)."""
+    from matplotlib.figure import Figure
+
+    if isinstance(obj, Figure):
+        return chart_renderer.render(obj)
+    return obj
+
+
+def _serve(conn, env: dict, limits: Optional[CellLimits]):
+    """Main loop of a kernel worker process."""
+    # The parent owns Ctrl+C; the kernel only gets SIGINT to interrupt a cell
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    _warm_up()
+    notebook = Notebook(env=dict(env), limits=limits, exclusive=True)
+    while True:
+        try:
+            op, payload = conn.recv()
+        except KeyboardInterrupt:
+            continue  # the interrupt arrived after the cell had finished
+        except EOFError:
+            break
+        if op == "exec":
+            try:
+                output = notebook.exec(payload)
+            except KeyboardInterrupt:
+                output = NotebookCellOutput(console="Error: execution interrupted", vars=None)
+            vars_ = tuple(_portable(v) for v in output.vars)
+            try:
+                conn.send((output.console, vars_, output.error))
+            except Exception:
+                conn.send((output.console, tuple(repr(v) for v in vars_), output.error))
+        elif op == "ping":
+            conn.send(os.getpid())
+
+
+def _zygote_main(fd: int) -> None:
+    """
+    Main loop of the kernel zygote: build the notebook globals once, then
+    fork a kernel for every request. The process never starts a thread, so
+    every fork copies a consistent state (no lock held by another thread).
+    """
+    # Ctrl+C reaches the whole process group; the pool shuts the zygote down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    conn = Connection(fd)
+    env_factory, env_args, limits = conn.recv()
+    try:
+        _warm_up()
+        env = env_factory(*env_args)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", getattr(env.get("bom_graph"), "version", None)))
+    # Exited kernels are reaped automatically instead of staying zombies
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        try:
+            conn.recv()
+            kernel_fd = reduction.recv_handle(conn)
+        except (EOFError, OSError):
+            break
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            code = 0
+            try:
+                _serve(Connection(kernel_fd), env, limits)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(kernel_fd)
+        conn.send(pid)
+
+
+class _Zygote:
+    """
+    A fresh interpreter (not a fork of this multi-threaded process) that
+    holds the notebook globals and forks kernels from itself, so kernels
+    share them copy-on-write.
+    """
+
+    def __init__(self, env_factory: Callable[..., dict], env_args: tuple, limits: Optional[CellLimits]):
+        ours, theirs = socket.socketpair()
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+        # pyarrow's jemalloc (imported by pandas) would otherwise start a background thread
+        env.setdefault("JE_ARROW_MALLOC_CONF", "background_thread:false")
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", "import sys; from spec.utils.kernel import _zygote_main; _zygote_main(int(sys.argv[1]))", str(theirs.fileno())],
+            pass_fds=(theirs.fileno(),),
+            env=env,
+        )
+        theirs.close()
+        self._conn = Connection(ours.detach())
+        try:
+            self._conn.send((env_factory, env_args, limits))
+            status, value = self._conn.recv()
+        except (EOFError, OSError) as e:
+            self.close()
+            raise KernelDied(f"the kernel zygote exited with code {self.process.poll()}") from e
+        if status != "ready":
+            self.close()
+            raise KernelDied(f"the kernel zygote failed to start: {value}")
+        self.data_version = value
+        # Fork requests and their replies share the connection
+        self._fork_lock = threading.Lock()
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def fork(self) -> Tuple[int, Connection]:
+        """A new kernel: its pid and the connection to it."""
+        ours, theirs = mp.Pipe()
+        try:
+            with self._fork_lock:
+                self._conn.send("fork")
+                reduction.send_handle(self._conn, theirs.fileno(), self.process.pid)
+                pid = self._conn.recv()
+        except (EOFError, OSError) as e:
+            ours.close()
+            raise KernelDied(f"the kernel zygote exited with code {self.process.poll()}") from e
+        finally:
+            theirs.close()
+        return pid, ours
+
+    def close(self) -> None:
+        """Stop forking; kernels already forked keep running."""
+        with self._fork_lock:
+            self._conn.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Kernel:
+    """
+    One worker process holding the namespace of one session.
+
+    The worker enforces the cell limits itself; the parent stops it hard when
+    a cell keeps running past the timeout (plus `GRACE` seconds) or keeps
+    growing past the memory limit, e.g. inside one long C call.
+    """
+
+    GRACE = 5.0
+    POLL = 0.25
+
+    def __init__(self, zygote: _Zygote, limits: Optional[CellLimits] = None):
+        self.limits = limits
+        # The data the worker inherits at fork time; a later BOM reload does not reach it
+        self.data_version = zygote.data_version
+        self.pid, self._conn = zygote.fork()
+        self._lock = threading.Lock()
+        self.session_id: Optional[str] = None
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        # Not our child (the zygote reaps it), so no exit code: a gone pid means it died
+        return _pid_alive(self.pid)
+
+    def exec(self, code: str) -> NotebookCellOutput:
+        """Run one cell; cells of the same session run one after another."""
+        with self._lock:
+            self.last_used = time.monotonic()
+            try:
+                self._conn.send(("exec", code))
+                self._wait()
+                console, vars_, error = self._conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+                raise KernelDied(f"worker {self.pid} exited") from e
+            finally:
+                self.last_used = time.monotonic()
+        return NotebookCellOutput(console=console, vars=vars_, error=error)
+
+    def _wait(self) -> None:
+        """Wait for the cell result, killing the worker if it overruns its limits."""
+        limits = self.limits
+        if limits is None or not (limits.timeout or limits.max_memory_mb):
+            return
+        start, base = time.monotonic(), rss_bytes(self.pid)
+        while not self._conn.poll(self.POLL):
+            if not self.is_alive():
+                return  # recv() raises EOFError
+            elapsed = time.monotonic() - start
+            violation = None
+            if limits.timeout and elapsed > limits.timeout + self.GRACE:
+                violation = ("timeout", limits.timeout, round(elapsed, 1))
+            elif limits.max_memory_mb and base is not None:
+                used_mb = ((rss_bytes(self.pid) or base) - base) // 2**20
+                if used_mb > limits.max_memory_mb * 1.25:
+                    violation = ("memory", limits.max_memory_mb, used_mb)
+            if violation:
+                self._kill(signal.SIGKILL)
+                error = CellLimitExceeded(*violation)
+                error.hint += " The session kernel was restarted: all variables are lost."
+                raise error
+
+    def interrupt(self) -> None:
+        """Raise KeyboardInterrupt in the cell currently running in the worker."""
+        if self.is_alive():
+            self._kill(signal.SIGINT)
+
+    def shutdown(self) -> None:
+        try:
+            self._conn.close()  # the worker exits on EOF
+        finally:
+            deadline = time.monotonic() + 1
+            while self.is_alive() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self._kill(signal.SIGTERM)
+
+    def _kill(self, sig: int) -> None:
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+class KernelPool:
+    """
+    Per-session notebook kernels in forked worker processes.
+
+        • workers are forked from a zygote: a fresh, single-threaded
+          interpreter that builds the notebook globals once with
+          `env_factory(*env_args())` and forks a kernel per request, so
+          `BOM_df`, `bom_graph` and the other globals are shared copy-on-write
+          (forking this multi-threaded process itself could copy a lock held
+          by another thread and deadlock the kernel)
+        • nothing is started before `start()` or the first session: the
+          zygote holds a copy of the data, and building it takes a while
+        • zygotes are built without holding the pool's lock, so sessions that
+          already have a kernel keep running cells meanwhile
+        • `recycle()` starts a new zygote, e.g. with the reloaded BOM data
+        • `size` prewarmed workers (pandas/matplotlib already imported) wait
+          for new sessions; a replacement is forked as soon as one is taken
+        • every session gets its own worker and so its own namespace, kept
+          between cells; a heavy cell only occupies its own process
+        • kernels idle for more than `idle_ttl` seconds are shut down, and the
+          least recently used one when `max_kernels` is reached
+        • a kernel that dies (e.g. killed by the OOM killer) is dropped; the
+          next cell of the session starts on a fresh kernel
+
+    Usage:
+        pool = KernelPool(build_notebook_env, lambda: (BOM_df, version), size=2, limits=CellLimits(timeout=60))
+        pool.start()  # optional: prewarm in the background
+        output = pool.exec(session_id, "BOM_df.shape")
+        pool.release(session_id)
+    """
+
+    # ───────────────────────────── constructor ─────────────────────────────────
+    def __init__(
+        self,
+        env_factory: Callable[..., dict],
+        env_args: Callable[[], tuple],
+        size: int = 2,
+        idle_ttl: float = 900.0,
+        max_kernels: int = 32,
+        limits: Optional[CellLimits] = None,
+    ):
+        # env_factory runs in the zygote and must be importable there (a module-level function)
+        self.env_factory = env_factory
+        self.env_args = env_args
+        self.limits = limits
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.max_kernels = max_kernels
+        self._zygote: Optional[_Zygote] = None
+        # Data version of the current zygote; read without a lock from the event loop
+        self._data_version: Any = None
+        # Bumped by `recycle()`: kernels forked before it are not kept warm
+        self._generation = 0
+        self._lock = threading.RLock()
+        # Serializes zygote builds, which take seconds, apart from `_lock`
+        self._zygote_lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._warm: deque[Kernel] = deque()
+        self._sessions: OrderedDict[str, Kernel] = OrderedDict()
+        self._started = False
+        self._closed = False
+        self.evictions = 0
+        self.deaths = 0
+
+        if idle_ttl > 0:
+            threading.Thread(target=self._reap, daemon=True).start()
+
+    # ───────────────────────────── public API ──────────────────────────────────
+    def start(self) -> None:
+        """Build the zygote and the prewarmed kernels on a background thread."""
+        self._started = True
+        threading.Thread(target=self._fill, daemon=True).start()
+
+    def exec(self, session_id: str, code: str) -> NotebookCellOutput:
+        """Run *code* in the kernel of *session_id*, starting one if needed."""
+        with self._lock:
+            previous = self._sessions.get(session_id)
+        try:
+            if previous is not None and not previous.is_alive():
+                raise KernelDied(f"worker {previous.pid} exited")
+            return self.kernel(session_id).exec(code)
+        except CellLimitExceeded as e:
+            self.release(session_id)
+            return NotebookCellOutput(console=f"Error: {e}", vars=None, error=e.to_dict())
+        except KernelDied as e:
+            self.deaths += 1
+            self.release(session_id)
+            return NotebookCellOutput(
+                console=(
+                    f"Error: the notebook kernel died ({e}), probably out of memory. "
+                    "All variables of this session are lost; reduce the data size and run the cell again."
+                ),
+                vars=None,
+            )
+
+    async def aexec(self, session_id: str, code: str) -> NotebookCellOutput:
+        """`exec` without blocking the event loop; cancelling the caller interrupts the cell."""
+        try:
+            return await asyncio.to_thread(self.exec, session_id, code)
+        except asyncio.CancelledError:
+            self.interrupt(session_id)
+            raise
+
+    def kernel(self, session_id: str) -> Kernel:
+        """The kernel of *session_id*, taking a prewarmed one for a new session."""
+        self._started = True
+        stale = []
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+            if kernel is not None and kernel.is_alive():
+                self._sessions.move_to_end(session_id)
+                return kernel
+            if kernel is not None:
+                stale.append(self._sessions.pop(session_id))
+
+            kernel = None
+            while self._warm and kernel is None:
+                candidate = self._warm.popleft()
+                kernel = candidate if candidate.is_alive() else None
+        for old in stale:
+            old.shutdown()
+
+        # No prewarmed kernel: fork one (building a zygote if needed) without holding the lock
+        kernel = kernel or self._spawn()
+        evicted = []
+        with self._lock:
+            while len(self._sessions) >= self.max_kernels:
+                _, oldest = self._sessions.popitem(last=False)
+                evicted.append(oldest)
+                self.evictions += 1
+            kernel.session_id = session_id
+            self._sessions[session_id] = kernel
+        for old in evicted:
+            old.shutdown()
+        threading.Thread(target=self._fill, daemon=True).start()
+        return kernel
+
+    def data_version(self, session_id: str) -> Any:
+        """
+        BOM data version seen by the kernel of *session_id* (or by a new kernel), None
+        while no zygote is running: a new kernel then gets the current data. Never blocks.
+        """
+        kernel = self._sessions.get(session_id)
+        if kernel is not None and kernel.is_alive():
+            return kernel.data_version
+        return self._data_version
+
+    def interrupt(self, session_id: str) -> None:
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+        if kernel is not None:
+            kernel.interrupt()
+
+    def release(self, session_id: str) -> None:
+        """Shut down the kernel of *session_id* and forget its namespace."""
+        with self._lock:
+            kernel = self._sessions.pop(session_id, None)
+        if kernel is not None:
+            kernel.shutdown()
+
+    def recycle(self) -> None:
+        """Replace the zygote and the prewarmed kernels, e.g. after the notebook globals changed."""
+        with self._lock:
+            stale, self._warm = list(self._warm), deque()
+            zygote, self._zygote = self._zygote, None
+            self._data_version = None
+            self._generation += 1
+        for kernel in stale:
+            kernel.shutdown()
+        if zygote is not None:
+            zygote.close()
+        if self._started:
+            threading.Thread(target=self._fill, daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "warm": len(self._warm),
+                "evictions": self.evictions,
+                "deaths": self.deaths,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            kernels = list(self._warm) + list(self._sessions.values())
+            self._warm.clear()
+            self._sessions.clear()
+            zygote, self._zygote = self._zygote, None
+        for kernel in kernels:
+            kernel.shutdown()
+        if zygote is not None:
+            zygote.close()
+
+    # ───────────────────────────── implementation details ─────────────────────
+    def _spawn(self) -> Kernel:
+        return Kernel(self._current_zygote(), self.limits)
+
+    def _current_zygote(self) -> _Zygote:
+        zygote = self._zygote
+        if zygote is not None and zygote.is_alive():
+            return zygote
+        with self._zygote_lock:
+            zygote = self._zygote
+            if zygote is not None and zygote.is_alive():
+                return zygote
+            zygote = _Zygote(self.env_factory, self.env_args(), self.limits)
+            with self._lock:
+                closed = self._closed
+                if not closed:
+                    self._zygote, self._data_version = zygote, zygote.data_version
+        if closed:
+            zygote.close()
+            raise KernelDied("the kernel pool was shut down")
+        return zygote
+
+    def _fill(self) -> None:
+        # One filler at a time; the running one sees the kernels taken meanwhile
+        if not self._fill_lock.acquire(blocking=False):
+            return
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._warm) >= self.size:
+                        return
+                    generation = self._generation
+                try:
+                    kernel = self._spawn()
+                except KernelDied:
+                    if generation != self._generation:
+                        continue  # the zygote was recycled while forking: fork from the new one
+                    raise
+                with self._lock:
+                    keep = generation == self._generation and not self._closed
+                    if keep:
+                        self._warm.append(kernel)
+                if not keep:
+                    kernel.shutdown()
+        except KernelDied as e:
+            # Retried when the next session needs a kernel
+            logger.error(f"Failed to start a notebook kernel: {e}")
+        finally:
+            self._fill_lock.release()
+
+    def _reap(self) -> None:
+        while not self._closed:
+            time.sleep(min(self.idle_ttl / 4, 30.0))
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    sid for sid, k in self._sessions.items()
+                    if now - k.last_used > self.idle_ttl and not k._lock.locked()
+                ]
+                kernels = [self._sessions.pop(sid) for sid in idle]
+                self.evictions += len(kernels)
+            for kernel in kernels:
+                kernel.shutdown()
@@ -12,6 +12,8 @@ from openai.types.responses.response import Response
 from pydantic import BaseModel
 
 from spec.config import async_client, client, logger
+from spec.utils.metrics import llm_retries_total, llm_seconds, llm_tokens_total
+from spec.utils.tracing import tracer
 
 DEFAULT_TEXT_MODEL = "gpt-4o-mini"
 
@@ -78,6 +80,7 @@ def retry_with_exponential_backoff(
             except errors as e:
                 # Increment retries
                 num_retries += 1
+                llm_retries_total.inc(model=kwargs.get("model", "unknown"), error=type(e).__name__)
 
                 # Check if max retries has been reached
                 if num_retries > max_retries:
@@ -87,7 +90,8 @@ def retry_with_exponential_backoff(
                 delay *= exponential_base * (1 + jitter * random.random())
 
                 # Sleep for the delay
-                time.sleep(delay)
+                with tracer.span("llm.retry", kind="retry", model=kwargs.get("model", "unknown"), error=type(e).__name__, attempt=num_retries, delay=delay):
+                    time.sleep(delay)
 
             # Raise exceptions for any errors not specified
             except Exception as e:
@@ -136,13 +140,15 @@ def async_retry_with_exponential_backoff(
                 return await func(*args, **kwargs)
 
             except errors as e:
+                llm_retries_total.inc(model=kwargs.get("model", "unknown"), error=type(e).__name__)
                 if attempt > max_retries:
                     raise e
 
                 # tăng delay
                 delay *= exponential_base * (1 + jitter * random.random())
                 logger.info(f"DELAY: {delay}")
-                await asyncio.sleep(delay)
+                with tracer.span("llm.retry", kind="retry", model=kwargs.get("model", "unknown"), error=type(e).__name__, attempt=attempt, delay=delay):
+                    await asyncio.sleep(delay)
 
             except Exception as e:
                 raise e
@@ -158,10 +164,20 @@ async def acompletion_with_backoff(client: openai.AsyncClient | openai.AsyncAzur
     # else:
     #     return await async_client.responses.create(**kwargs)
     
-    if kwargs.get("response_format"):
-        return await async_client.beta.chat.completions.parse(**kwargs)
-    else:
-        return await async_client.chat.completions.create(**kwargs)
+    model = kwargs.get("model", "unknown")
+    with tracer.span("llm", kind="llm", model=model, source="completion") as span:
+        with llm_seconds.time(model=model, source="completion"):
+            if kwargs.get("response_format"):
+                completion = await async_client.beta.chat.completions.parse(**kwargs)
+            else:
+                completion = await async_client.chat.completions.create(**kwargs)
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            llm_tokens_total.inc(usage.prompt_tokens, model=model, source="completion", direction="input")
+            llm_tokens_total.inc(usage.completion_tokens, model=model, source="completion", direction="output")
+            if span is not None:
+                span.attributes.update(input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens)
+    return completion
     
 class LLM:
     """
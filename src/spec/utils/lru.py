@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+__all__ = ["LRUCache"]
+
+
+def _default_sizeof(value: Any) -> int:
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, tuple):
+        return sum(_default_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by total size and/or item count.
+
+    Args:
+        max_bytes (Optional[int]): Evict until the summed size of all entries fits. None = unbounded.
+        max_items (Optional[int]): Evict until at most this many entries remain. None = unbounded.
+        sizeof (Callable): Returns the size in bytes of a value. Defaults to `nbytes` for
+            numpy/pandas objects and `sys.getsizeof` otherwise.
+        ttl (Optional[float]): Seconds an entry lives after it was last stored or read. None = forever.
+        on_evict (Optional[Callable]): Called with (key, value) for each entry evicted to make room,
+            under the cache lock (not for expired, popped or cleared entries).
+
+    Usage:
+        cache = LRUCache(max_bytes=256 * 1024**2)
+        cache.put(key, value)
+        value = cache.get(key)
+        cache.stats()  # {"hits": ..., "misses": ..., ...}
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_items: Optional[int] = None,
+        sizeof: Callable[[Any], int] = _default_sizeof,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.on_evict = on_evict
+
+        # key -> (value, size, expiry); the order is the access order, so expired entries are at the front
+        self._data: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self.pop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            if self.ttl is not None:
+                self._data[key] = (entry[0], entry[1], self._expiry())
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like `get`, but without counting a hit/miss or refreshing the entry's recency."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                return default
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> bool:
+        """Insert *value*; returns False if it alone exceeds `max_bytes` and was not stored."""
+        size = self.sizeof(value) if size is None else size
+        with self._lock:
+            self.pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return False
+            self._data[key] = (value, size, self._expiry())
+            self.nbytes += size
+            self._evict()
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.nbytes -= entry[1]
+            return entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._data),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def expire(self) -> int:
+        """Drop all expired entries now; returns how many were dropped."""
+        with self._lock:
+            now, dropped = time.monotonic(), 0
+            while self._data:
+                key, (_, size, expiry) = next(iter(self._data.items()))
+                if expiry >= now:
+                    break
+                self._data.popitem(last=False)
+                self.nbytes -= size
+                dropped += 1
+            self.expirations += dropped
+            return dropped
+
+    def _expiry(self) -> float:
+        return time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self.expire()
+        while self._data and (
+            (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            or (self.max_items is not None and len(self._data) > self.max_items)
+        ):
+            key, (value, size, _) = self._data.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[2] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
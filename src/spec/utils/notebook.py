@@ -1,20 +1,27 @@
-
 import asyncio
-import io
+import builtins
 import re
-import sys
-from typing import Any
+from typing import Any, Optional
 
+import pandas as pd
 from pydantic import BaseModel
 
+from spec.utils.code_analysis import analyze_code
+from spec.utils.results import frame_preview
+from spec.utils.sandbox import (CellLimitExceeded, CellLimits, capture_stdout,
+                                check_result, run_cancellable, run_limited,
+                                truncate_output)
+
 
 class NotebookCellOutput:
-    def __init__(self, console: str, vars: Any):
+    def __init__(self, console: str, vars: Any, error: Optional[dict] = None):
         if isinstance(vars, tuple):
             self.vars = vars
         else:
             self.vars = (vars,)
         self.console = console
+        # Structured error (e.g. `CellLimitExceeded.to_dict()`) the agent can act on
+        self.error = error
 
 class Cell:
     def __init__(self, code: str, output: NotebookCellOutput):
@@ -22,55 +29,60 @@ class Cell:
         self.output = output
 
 class Notebook:
-    def __init__(self, env=None):
+    def __init__(self, env=None, limits: Optional[CellLimits] = None, exclusive: bool = False):
         if env is None:
             env = {"__builtins__": __builtins__}
-        
+
         self.env = env
+        self.limits = limits
+        # The process runs only this notebook's cells, so its memory and CPU limits apply (see run_limited)
+        self.exclusive = exclusive
         self.cells = []
+        # Installed once rather than per cell, so concurrent cells cannot restore each other's print
+        self.env["print"] = self._print
 
     def exec(self, code: str) -> NotebookCellOutput:
-        old_stdout, buf = sys.stdout, io.StringIO()
-        sys.stdout = buf
+        vars_, error = None, None
+        with capture_stdout() as buf:
+            try:
+                vars_ = run_limited(self._run, code, limits=self.limits, exclusive=self.exclusive)
+                check_result(vars_, self.limits)
+                if isinstance(vars_, (pd.DataFrame, pd.Series)):
+                    # The frame itself goes to the UI; the agent only needs its shape and first rows
+                    self._print(frame_preview(vars_))
+                elif vars_ is not None:
+                    self._print(vars_)
+            except CellLimitExceeded as e:
+                vars_, error = None, e
+                self._print(f"Error: {e}")
+
+        console, truncated = truncate_output(buf.getvalue(), self.limits)
+        error = error or truncated
+        output = NotebookCellOutput(console=console, vars=vars_, error=error.to_dict() if error else None)
+        self.cells.append(Cell(code=code, output=output))
+        return output
 
+    def _run(self, code: str) -> Any:
+        """Execute *code* and return the value of its last statement, if it is an expression."""
         vars_ = None
-        orig_print = self.env.get("print", print)
-
-        def _print(*args, **kwargs):
-            orig_print(*map(self._resolve, args), **kwargs)
-        self.env["print"] = _print
-
         try:
-            lines = code.strip().splitlines()
-            if lines:
-                *body, last = lines
-                body_code = "\n".join(body)
-                if body_code:
-                    exec(body_code, self.env)
-
-                try:
-                    vars_ = self._resolve(eval(last, self.env))
-                except Exception:
-                    exec(last, self.env)
-                    vars_ = None
-
-                if vars_ is not None:
-                    _print(vars_)
-            else:
-                exec(code, self.env)
+            analysis = analyze_code(code)
+            analysis.raise_syntax_error()
+            if analysis.body_code is not None:
+                exec(analysis.body_code, self.env)
+            if analysis.last_expr_code is not None:
+                vars_ = self._resolve(eval(analysis.last_expr_code, self.env))
+            elif analysis.last_code is not None:
+                exec(analysis.last_code, self.env)
 
         except Exception as e:
-            _print(f"Error: {e}")
+            self._print(f"Error: {e}")
+        return vars_
 
-        finally:
-            sys.stdout = old_stdout
-            self.env["print"] = orig_print
+    async def aexec(self, code: str) -> NotebookCellOutput:
+        """`exec` in a worker thread; cancelling the caller interrupts the cell."""
+        return await run_cancellable(self.exec, code)
 
-        console = buf.getvalue()
-        output = NotebookCellOutput(console=console, vars=vars_)
-        self.cells.append(Cell(code=code, output=output))
-        return output
-    
     def vars(self, print_all=True):
         vals = {
             k: v for k, v in self.env.items() if not (k.startswith("__") and k.endswith("__"))
@@ -85,6 +97,9 @@ class Notebook:
         blocks = re.findall(pattern, text, flags=re.DOTALL)
         return [b.strip() for b in blocks]
 
+    def _print(self, *args, **kwargs):
+        builtins.print(*map(self._resolve, args), **kwargs)
+
     def _resolve(self, obj):
         """Return *obj* if it isn't a coroutine; otherwise run it to completion."""
         if asyncio.iscoroutine(obj):
@@ -102,4 +117,3 @@ class Notebook:
             return type(obj)(self._resolve(v) for v in obj)
 
         return obj
-
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Optional
+
+import pandas as pd
+
+from spec.utils.bom import BOMGraph
+from spec.utils.bom_diff import bom_scope, diff_bom
+from spec.utils.part_index import PartIndex
+
+__all__ = ["LazyBOMSQL", "build_notebook_env"]
+
+
+class LazyBOMSQL:
+    """
+    A `BOMSQLEngine` created on first use.
+
+    A DuckDB connection does not survive a fork, so kernels never inherit
+    one: each kernel that actually runs SQL loads its own.
+    """
+
+    def __init__(self, df: pd.DataFrame, threads: Optional[int] = None):
+        self._df = df
+        self._threads = threads
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        with self._lock:
+            if self._engine is None:
+                from spec.utils.bom_sql import BOMSQLEngine
+
+                self._engine = BOMSQLEngine(self._df, threads=self._threads)
+        return getattr(self._engine, name)
+
+
+def build_notebook_env(
+    BOM_df: pd.DataFrame,
+    version: Any,
+    total_specbook: int,
+    bom_sql: bool = True,
+    bom_sql_threads: Optional[int] = None,
+) -> dict:
+    """
+    The notebook globals of the kernels (see `KernelPool`), built in the
+    kernel zygote from the BOM data: the same names as the in-process
+    notebook, each kernel's `bom_sql` loaded on first use.
+    """
+    graph = BOMGraph(BOM_df, version=version)
+    return {
+        "pd": pd,
+        "BOM_df": BOM_df,
+        "bom_graph": graph,
+        "part_index": PartIndex(graph.part_ids),
+        "bom_sql": LazyBOMSQL(BOM_df, threads=bom_sql_threads) if bom_sql else None,
+        "total_specbook": total_specbook,
+        "diff_bom": diff_bom,
+        "bom_scope": bom_scope,
+    }
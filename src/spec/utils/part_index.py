@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = ["PartIndex"]
+
+_NON_ALNUM_RE = re.compile(r"[^0-9A-Z]")
+# Tokens that look like part codes: letters and digits mixed, at least 5 characters
+_PART_CODE_RE = re.compile(r"\b(?=[\w.\-]*\d)(?=[\w.\-]*[A-Za-z])[\w.\-]{5,}\b")
+_LETTERS_RE = re.compile(r"[A-Z]+")
+_DIGITS_RE = re.compile(r"[0-9]+")
+
+
+def normalize(part_id: str) -> str:
+    """Upper-case and strip separators, so `bat-0001.a` and `BAT0001A` compare equal."""
+    return _NON_ALNUM_RE.sub("", str(part_id).upper())
+
+
+def shape(key: str) -> str:
+    """Letter/digit layout of a normalized key with runs collapsed: `BAT00012A` → `A9A`."""
+    return _DIGITS_RE.sub("9", _LETTERS_RE.sub("A", key))
+
+
+def _ngrams(key: str, n: int) -> set[str]:
+    padded = f"^{key}$"
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class PartIndex:
+    """
+    Fuzzy lookup index over part IDs, built once at load time.
+
+        • prefix search over the sorted normalized IDs (binary search, the
+          array equivalent of a prefix trie)
+        • n-gram inverted index for partial or mistyped codes, ranked by the
+          Dice coefficient of shared n-grams. The n-grams a part shares with the
+          query are counted over all posting lists at once (one bincount), and
+          only the `max_candidates` parts with the largest overlap are scored.
+
+    Usage:
+        index = PartIndex(bom_graph.part_ids)
+        index.search("BAT0001", limit=5)  # [("BAT00012", 0.95), ...]
+        index.resolve("bat-00012")        # "BAT00012"
+    """
+
+    def __init__(self, part_ids: Iterable[str], n: int = 3, max_candidates: int = 1000):
+        self.n = n
+        self.max_candidates = max_candidates
+        self.part_ids = np.array([str(p) for p in part_ids if isinstance(p, str) and p], dtype=object)
+
+        keys = [normalize(p) for p in self.part_ids]
+        order = np.argsort(np.array(keys, dtype=str), kind="stable")
+        self._sorted_keys = np.array(keys, dtype=str)[order]
+        self._sorted_ids = order.astype(np.int32)
+        self._sorted_lengths = np.char.str_len(self._sorted_keys)
+        self._exact = defaultdict(list)
+        for i, key in enumerate(keys):
+            self._exact[key].append(i)
+        # What a part ID looks like in this BOM, to tell part codes in free text from other words
+        self._shapes = {shape(key) for key in keys}
+        self._key_lengths = (int(self._sorted_lengths.min()), int(self._sorted_lengths.max())) if keys else (0, 0)
+
+        postings: dict[str, list[int]] = defaultdict(list)
+        gram_counts = np.empty(len(keys), dtype=np.int32)
+        for i, key in enumerate(keys):
+            grams = _ngrams(key, n)
+            gram_counts[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._gram_counts = gram_counts
+
+    def __len__(self) -> int:
+        return len(self.part_ids)
+
+    def prefix(self, query: str, limit: int = 10) -> List[str]:
+        """Part IDs whose normalized form starts with the normalized *query*, shortest first."""
+        key = normalize(query)
+        if not key:
+            return []
+        positions = self._prefix_positions(key, limit)
+        return list(self.part_ids[self._sorted_ids[positions]])
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Ranked candidate part IDs for a partial or mistyped *query*.
+
+        Exact matches score 1.0, prefix matches 0.9–1.0 depending on how much of
+        the ID the query covers, and the rest their n-gram Dice similarity.
+        """
+        key = normalize(query)
+        if not key:
+            return []
+
+        scores: dict[int, float] = {}
+        for i in self._exact.get(key, []):
+            scores[i] = 1.0
+
+        for position in self._prefix_positions(key, limit):
+            scores.setdefault(int(self._sorted_ids[position]), 0.9 + 0.1 * len(key) / self._sorted_lengths[position])
+
+        grams = _ngrams(key, self.n)
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        if lists:
+            # Each part appears at most once per posting list, so its count is the number of shared n-grams
+            shared = np.bincount(np.concatenate(lists), minlength=len(self.part_ids))
+            candidates = np.flatnonzero(shared)
+            if len(candidates) > self.max_candidates:
+                candidates = candidates[np.argpartition(-shared[candidates], self.max_candidates)[: self.max_candidates]]
+            shared = shared[candidates]
+
+            dice = 2 * shared / (len(grams) + self._gram_counts[candidates])
+            top = np.argsort(-dice, kind="stable")[: limit * 2]
+            for i, score in zip(candidates[top], dice[top]):
+                scores.setdefault(int(i), float(score))
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(self.part_ids[i], round(float(score), 4)) for i, score in ranked]
+
+    def _prefix_positions(self, key: str, limit: int) -> np.ndarray:
+        """Positions in the sorted keys of the *limit* shortest keys starting with *key*."""
+        lo = np.searchsorted(self._sorted_keys, key, side="left")
+        hi = np.searchsorted(self._sorted_keys, key + "~", side="left")  # '~' sorts after [0-9A-Z]
+        lengths = self._sorted_lengths[lo:hi]
+        if len(lengths) > limit:
+            best = np.argpartition(lengths, limit)[:limit]
+            best = best[np.argsort(lengths[best], kind="stable")]
+        else:
+            best = np.argsort(lengths, kind="stable")
+        return lo + best
+
+    def resolve(self, query: str, min_score: float = 0.75) -> Optional[str]:
+        """The single best part ID for *query*, or None if nothing scores at least *min_score*."""
+        candidates = self.search(query, limit=1)
+        if candidates and candidates[0][1] >= min_score:
+            return candidates[0][0]
+        return None
+
+    def is_part_shaped(self, token: str) -> bool:
+        """Whether *token* has the letter/digit layout and length of some part ID in the index."""
+        key = normalize(token)
+        lo, hi = self._key_lengths
+        return lo <= len(key) <= hi and shape(key) in self._shapes
+
+    def resolve_text(self, text: str, min_score: float = 0.85) -> dict[str, str]:
+        """Map every part-ID-shaped token in free *text* to its best part ID, when it differs."""
+        resolved = {}
+        for token in set(_PART_CODE_RE.findall(text)):
+            if not self.is_part_shaped(token):
+                continue
+            part_id = self.resolve(token, min_score=min_score)
+            if part_id is not None and part_id != token:
+                resolved[token] = part_id
+        return resolved
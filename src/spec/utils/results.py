@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+
+from spec.utils.lru import LRUCache
+
+__all__ = ["ResultHandle", "ResultStore", "arrow_page", "frame_preview"]
+
+PREVIEW_ROWS = 20
+PREVIEW_CHARS = 4000
+
+
+def frame_preview(df: pd.DataFrame | pd.Series, rows: int = PREVIEW_ROWS, max_chars: int = PREVIEW_CHARS) -> str:
+    """Bounded text view of a DataFrame/Series for the LLM: shape, schema and the first rows."""
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    lines = [f"DataFrame: {len(df)} rows x {df.shape[1]} columns (displayed to the User)."]
+    lines.append("Schema: " + ", ".join(f"{c}: {t}" for c, t in df.dtypes.astype(str).items()))
+    if len(df):
+        with pd.option_context("display.max_columns", 50, "display.width", 200, "display.max_colwidth", 60):
+            head = df.head(rows).to_string()
+        lines.append(f"First {min(rows, len(df))} rows:")
+        lines.append(head)
+    text = "\n".join(lines)
+    return text if len(text) <= max_chars else text[:max_chars] + "\n... [preview truncated]"
+
+
+def arrow_page(table: pa.Table, offset: int, size: int) -> bytes:
+    """Rows [offset, offset + size) of *table* as an Arrow IPC stream."""
+    page = table.slice(offset, size)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, page.schema) as writer:
+        writer.write_table(page)
+    return sink.getvalue().to_pybytes()
+
+
+@dataclass(frozen=True)
+class ResultHandle:
+    """Reference to a DataFrame kept server-side, fetched page by page."""
+
+    id: str
+    rows: int
+    columns: List[str]
+    dtypes: List[str]
+    page_size: int
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.rows // self.page_size))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "rows": self.rows,
+            "columns": self.columns,
+            "dtypes": self.dtypes,
+            "page_size": self.page_size,
+            "pages": self.pages,
+        }
+
+
+class ResultStore:
+    """
+    Server-side cursors over large DataFrame results.
+
+        • a frame is converted to an Arrow table once; every page is a
+          zero-copy slice of it, encoded as an Arrow IPC stream
+        • entries are evicted least-recently-used beyond `max_bytes`
+        • handle ids are random, so they double as access tokens
+        • the tables live in this process's memory: a handle only resolves
+          on the server worker that created it, so the API runs one worker
+          (a shared session store does not change that)
+
+    Usage:
+        store = ResultStore(page_size=500)
+        handle = store.put(df)  # None if the frame alone exceeds max_bytes
+        first = store.page(handle.id, 0)  # Arrow IPC stream bytes
+        handle, data = store.read(handle.id, 3)  # None once the result expired
+    """
+
+    def __init__(self, page_size: int = 500, max_bytes: Optional[int] = None):
+        self.page_size = page_size
+        self._tables = LRUCache(max_bytes=max_bytes, sizeof=lambda entry: entry[0].nbytes)
+
+    def put(self, df: pd.DataFrame) -> Optional[ResultHandle]:
+        """A handle on *df*, or None if its table alone is larger than `max_bytes`."""
+        if not isinstance(df.index, pd.RangeIndex):
+            # A meaningful index (e.g. the keys of value_counts()) becomes a column, as in inline frames
+            try:
+                df = df.reset_index()
+            except ValueError:  # an index level named like a column: keep the columns only
+                pass
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        handle = ResultHandle(
+            id=uuid4().hex,
+            rows=table.num_rows,
+            columns=[str(c) for c in df.columns],
+            dtypes=[str(t) for t in df.dtypes],
+            page_size=self.page_size,
+        )
+        if not self._tables.put(handle.id, (table, handle)):
+            return None
+        return handle
+
+    def handle(self, result_id: str) -> Optional[ResultHandle]:
+        entry = self._tables.get(result_id)
+        return entry[1] if entry else None
+
+    def page(self, result_id: str, page: int = 0, page_size: Optional[int] = None) -> Optional[bytes]:
+        """Page *page* (0-based) of a result, or None if the result expired or does not exist."""
+        read = self.read(result_id, page, page_size)
+        return read[1] if read is not None else None
+
+    def read(
+        self, result_id: str, page: int = 0, page_size: Optional[int] = None
+    ) -> Optional[Tuple[ResultHandle, bytes]]:
+        """The handle and page *page* of a result from one lookup, or None if it expired or does not exist."""
+        entry = self._tables.get(result_id)
+        if entry is None:
+            return None
+        table, handle = entry
+        size = page_size or handle.page_size
+        return handle, arrow_page(table, page * size, size)
+
+    def stats(self) -> dict:
+        return self._tables.stats()
@@ -104,6 +104,20 @@ class S3:
         except Exception as e:
             raise RuntimeError(f"Failed to upload file to S3: {e}")
 
+    def upload_bytes(self, data: bytes, s3_path: str, content_type: str = "application/octet-stream"):
+        """
+        Upload raw bytes as an object in the S3 bucket.
+
+        Args:
+            data (bytes): The object content.
+            s3_path (str): The destination path in the S3 bucket.
+            content_type (str): The object's Content-Type.
+        """
+        try:
+            self.client.put_object(Body=data, Bucket=self.bucket_name, Key=s3_path, ContentType=content_type)
+        except Exception as e:
+            raise RuntimeError(f"Failed to upload bytes to S3: {e}")
+
     def upload_stream(self, data: pd.DataFrame, s3_path: str):
         """
         Upload a DataFrame as a Parquet or CSV stream to the S3 bucket.
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import io
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not on Windows: no CPU limit
+    resource = None
+
+__all__ = [
+    "CellCancelled",
+    "CellLimitExceeded",
+    "CellLimits",
+    "capture_stdout",
+    "check_result",
+    "rss_bytes",
+    "run_cancellable",
+    "run_limited",
+    "truncate_output",
+]
+
+
+class CellCancelled(BaseException):
+    """
+    Raised inside a cell whose caller was cancelled.
+
+    A BaseException, so a bare `except Exception` in user code does not swallow it.
+    """
+
+
+@dataclass
+class CellLimits:
+    """
+    Per-cell resource limits. None disables a limit.
+
+    The memory and CPU limits are measured on the whole process, so they are
+    only enforced where the process runs nothing but the cell (a kernel
+    worker, see `run_limited`'s *exclusive*).
+
+    Attributes:
+        timeout (float): Wall-clock seconds a cell may run.
+        max_memory_mb (int): Memory (RSS growth) a cell may allocate.
+        max_cpu_seconds (float): CPU seconds a cell may use, all its threads together (RLIMIT_CPU).
+        max_output_chars (int): Printed output kept for the agent; the rest is cut.
+        max_result_rows (int): Rows of a DataFrame/Series returned as the last expression.
+    """
+
+    timeout: Optional[float] = 120.0
+    max_memory_mb: Optional[int] = 4096
+    max_cpu_seconds: Optional[float] = None
+    max_output_chars: Optional[int] = 20000
+    max_result_rows: Optional[int] = 200_000
+
+
+_HINTS = {
+    "timeout": "The cell ran too long. Work on a filtered subset, avoid row-wise loops/apply and cross joins, and prefer bom_graph or vectorized pandas operations.",
+    "cpu": "The cell used too much CPU time. Work on a filtered subset and prefer bom_graph or vectorized pandas operations over loops.",
+    "memory": "The cell used too much memory. Filter or aggregate before joining, select only the needed columns, and avoid cross joins.",
+    "output": "The printed output was too long and was cut. Print a summary instead, e.g. .head(), .describe() or aggregated counts.",
+    "result_size": "The result is too large to display. Aggregate first (groupby/value_counts) or return .head(n).",
+}
+
+
+class CellLimitExceeded(Exception):
+    """A cell hit one of its `CellLimits`; `to_dict()` is what the agent gets back."""
+
+    def __init__(self, kind: str, limit: Any, value: Any, hint: Optional[str] = None):
+        self.kind = kind
+        self.limit = limit
+        self.value = value
+        self.hint = hint or _HINTS.get(kind, "")
+        super().__init__(kind, limit, value)
+
+    def __str__(self) -> str:
+        return f"Cell exceeded the {self.kind} limit ({self.value} > {self.limit}). {self.hint}"
+
+    def to_dict(self) -> dict:
+        return {
+            "error": "CellLimitExceeded",
+            "kind": self.kind,
+            "limit": self.limit,
+            "value": self.value,
+            "hint": self.hint,
+        }
+
+
+class _LimitInterrupt(BaseException):
+    """Injected into a cell by the limits watchdog; surfaces as CellLimitExceeded."""
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """`sys.stdout` replacement that sends writes to the capture buffer of the current thread, if any."""
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self._fallback
+
+    def write(self, s: str) -> int:
+        return self._target().write(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def writable(self) -> bool:
+        return True
+
+    def __getattr__(self, name: str) -> Any:
+        # encoding, fileno, isatty, ... of the real stream
+        return getattr(self._fallback, name)
+
+
+_install_lock = threading.Lock()
+
+
+def _proxy() -> _ThreadLocalStdout:
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        return sys.stdout
+
+
+@contextmanager
+def capture_stdout() -> Iterator[io.StringIO]:
+    """
+    Capture what the current thread prints, without touching other threads.
+
+    `sys.stdout` is replaced once by a thread-aware proxy instead of being
+    swapped for every cell, so concurrent cells (and the server's own output)
+    never see each other's prints.
+    """
+    proxy = _proxy()
+    buf = io.StringIO()
+    previous = getattr(proxy._local, "buffer", None)
+    proxy._local.buffer = buf
+    try:
+        yield buf
+    finally:
+        proxy._local.buffer = previous
+
+
+def _async_raise(thread_id: int, exc_type: type[BaseException]) -> None:
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(exc_type))
+
+
+async def run_cancellable(fn: Callable[..., Any], *args: Any, executor: Optional[Executor] = None) -> Any:
+    """
+    Run `fn(*args)` in a worker thread so the event loop keeps serving other requests.
+
+    If the awaiting task is cancelled, `CellCancelled` is raised inside the
+    thread. Cancellation is cooperative: it takes effect at the next Python
+    bytecode, so a single long C call (e.g. one huge merge) finishes first.
+    """
+    loop = asyncio.get_running_loop()
+    state: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def _call():
+        with lock:
+            state["thread"] = threading.get_ident()
+        try:
+            return fn(*args)
+        finally:
+            # A pending CellCancelled fires here at the latest, never in the executor's own loop
+            with lock:
+                state.pop("thread", None)
+
+    future = loop.run_in_executor(executor, _call)
+    try:
+        return await future
+    except asyncio.CancelledError:
+        with lock:
+            if "thread" in state:
+                _async_raise(state["thread"], CellCancelled)
+        raise
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Current resident memory of a process (default: this one), None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_limited(
+    fn: Callable[..., Any],
+    *args: Any,
+    limits: Optional[CellLimits] = None,
+    exclusive: bool = False,
+    poll: float = 0.1,
+) -> Any:
+    """
+    Call `fn(*args)` in the current thread under the timeout, memory and CPU limits.
+
+    A watchdog thread checks the elapsed time and the RSS growth every *poll*
+    seconds and interrupts the call with `CellLimitExceeded`. Like
+    cancellation, this takes effect at the next Python bytecode; a hard stop
+    needs a separate process (see `KernelPool`).
+
+    The process's RSS and CPU time only measure the cell when the process runs
+    nothing else, so the memory and CPU limits apply only when *exclusive*
+    (a kernel worker, calling from its main thread). The CPU limit is a soft
+    RLIMIT_CPU, whose SIGXCPU interrupts the cell.
+    """
+    max_memory_mb = limits.max_memory_mb if limits is not None and exclusive else None
+    max_cpu = limits.max_cpu_seconds if limits is not None and exclusive and resource is not None else None
+    if limits is None or not (limits.timeout or max_memory_mb or max_cpu):
+        return fn(*args)
+
+    target = threading.get_ident()
+    start, base = time.monotonic(), rss_bytes()
+    # Reentrant: the SIGXCPU handler runs in the cell's thread, possibly while it holds the lock
+    done, lock = threading.Event(), threading.RLock()
+    tripped: dict[str, Any] = {}
+
+    def _trip(violation) -> None:
+        with lock:
+            if not done.is_set():
+                tripped["violation"] = violation
+                _async_raise(target, _LimitInterrupt)
+
+    def _watch():
+        while not done.wait(poll):
+            elapsed = time.monotonic() - start
+            if limits.timeout and elapsed > limits.timeout:
+                violation = ("timeout", limits.timeout, round(elapsed, 1))
+            elif max_memory_mb and base is not None:
+                used_mb = ((rss_bytes() or base) - base) // 2**20
+                if used_mb <= max_memory_mb:
+                    continue
+                violation = ("memory", max_memory_mb, used_mb)
+            else:
+                continue
+            _trip(violation)
+            return
+
+    restore_cpu = _limit_cpu(max_cpu, _trip) if max_cpu else None
+    threading.Thread(target=_watch, daemon=True).start()
+    try:
+        try:
+            return fn(*args)
+        finally:
+            with lock:
+                done.set()
+            if restore_cpu is not None:
+                restore_cpu()
+    except _LimitInterrupt:
+        raise CellLimitExceeded(*tripped["violation"]) from None
+
+
+def _limit_cpu(seconds: float, trip: Callable[[tuple], None]) -> Optional[Callable[[], None]]:
+    """Set a soft RLIMIT_CPU *seconds* from now; returns the function that lifts it again."""
+    if threading.current_thread() is not threading.main_thread():
+        return None  # signal handlers can only be installed (and only run) in the main thread
+    used = _cpu_seconds()
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = math.ceil(used + seconds)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+
+    def _on_xcpu(signum, frame):
+        # Sent again every CPU second while over the limit; the first one interrupts the cell
+        trip(("cpu", seconds, round(_cpu_seconds() - used, 1)))
+
+    previous = signal.signal(signal.SIGXCPU, _on_xcpu)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+    def restore():
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        signal.signal(signal.SIGXCPU, previous)
+
+    return restore
+
+
+def truncate_output(console: str, limits: Optional[CellLimits]) -> tuple[str, Optional[CellLimitExceeded]]:
+    """Cut *console* to `max_output_chars`; the error tells the agent it was cut."""
+    cap = limits.max_output_chars if limits else None
+    if not cap or len(console) <= cap:
+        return console, None
+    error = CellLimitExceeded("output", cap, len(console))
+    return console[:cap] + f"\n... [output truncated: {len(console) - cap} more characters]\n", error
+
+
+def check_result(value: Any, limits: Optional[CellLimits]) -> None:
+    """Raise CellLimitExceeded if *value* is a DataFrame/Series above `max_result_rows`."""
+    cap = limits.max_result_rows if limits else None
+    if cap and hasattr(value, "shape") and hasattr(value, "iloc") and len(value) > cap:
+        raise CellLimitExceeded("result_size", cap, len(value))
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from uuid import uuid4
+
+from spec.config import settings
+from spec.utils.conversation_log import ConversationLog, LocalLogSink
+from spec.utils.lru import LRUCache
+
+__all__ = ["JSONLCollector", "MemoryCollector", "Span", "Tracer", "traced", "tracer"]
+
+_current: ContextVar[Optional["Span"]] = ContextVar("spec_span", default=None)
+
+
+@dataclass
+class Span:
+    """One timed operation of a request; `parent_id` links it into the trace tree."""
+
+    trace_id: str
+    span_id: str
+    name: str
+    kind: str = "internal"
+    parent_id: Optional[str] = None
+    start_time: float = field(default_factory=time.time)  # wall clock, for display
+    duration: Optional[float] = None  # seconds, None while running
+    status: str = "ok"
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class MemoryCollector:
+    """Finished spans of the last `max_traces` traces, for the summary endpoint."""
+
+    def __init__(self, max_traces: int = 1000):
+        self._traces = LRUCache(max_items=max_traces)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = []
+                self._traces.put(span.trace_id, spans, size=0)
+            spans.append(span)
+
+    def spans(self, trace_id: str) -> Optional[List[Span]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return list(spans) if spans is not None else None
+
+    def summary(self, trace_id: str, top: int = 10) -> Optional[dict]:
+        """Where a request spent its time: totals per span kind and name, and the slowest spans."""
+        spans = self.spans(trace_id)
+        if spans is None:
+            return None
+        roots = [s for s in spans if s.parent_id is None]
+        by_kind: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        by_name: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        for s in spans:
+            for bucket in (by_kind[s.kind], by_name[s.name]):
+                bucket["count"] += 1
+                bucket["seconds"] += s.duration or 0.0
+        slowest = sorted(spans, key=lambda s: s.duration or 0.0, reverse=True)[:top]
+        return {
+            "trace_id": trace_id,
+            "duration": max((s.duration or 0.0 for s in roots), default=None),
+            "spans": len(spans),
+            "errors": sum(s.status == "error" for s in spans),
+            "by_kind": dict(by_kind),
+            "by_name": dict(by_name),
+            "slowest": [s.to_dict() for s in slowest],
+        }
+
+
+class JSONLCollector:
+    """Finished spans as JSON lines in `<directory>/traces.jsonl`, written in the background."""
+
+    def __init__(self, directory: str, flush_interval: float = 2.0):
+        self._log = ConversationLog(LocalLogSink(directory), flush_interval=flush_interval)
+
+    def export(self, span: Span) -> None:
+        self._log.append("traces", [span.to_dict()])
+
+    def close(self) -> None:
+        self._log.close()
+
+
+class Tracer:
+    """
+    Local, exporter-agnostic request tracing.
+
+        • the current span lives in a context variable, so it follows the
+          request across awaits and into the tasks it creates (tool calls,
+          the specbook fan-out); spans nest without passing them around
+        • `span()` times a block and makes it the current span; `start()`/
+          `end()` are for spans opened and closed in different callbacks
+          (agent run hooks), which run in tasks of their own and so cannot
+          change the current span of the run
+        • a span can be bound to an owner object (the user context of an
+          agent run) for code that has the owner but not the context
+        • finished spans go to every collector (in memory for the summary
+          endpoint, JSONL on disk)
+
+    Usage:
+        with tracer.span("chat", kind="request", trace_id=trace_id):
+            with tracer.span("specbook", specbook="SB-001"):
+                ...
+        tracer.memory.summary(trace_id)
+    """
+
+    def __init__(self, collectors: Sequence[Any] = (), enabled: bool = True):
+        self.collectors = list(collectors)
+        self.enabled = enabled
+        self.memory: Optional[MemoryCollector] = next((c for c in self.collectors if isinstance(c, MemoryCollector)), None)
+        # id(owner) -> span the owner's work nests under
+        self._bound: Dict[int, Span] = {}
+
+    @staticmethod
+    def new_trace_id() -> str:
+        return uuid4().hex
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current.get()
+
+    def start(
+        self, name: str, kind: str = "internal", parent: Optional[Span] = None, trace_id: Optional[str] = None, **attributes
+    ) -> Optional[Span]:
+        """Open a span under *parent* (default: the current span); a span without either starts a trace."""
+        if not self.enabled:
+            return None
+        parent = parent if parent is not None else _current.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent is not None else self.new_trace_id()
+        same_trace = parent is not None and parent.trace_id == trace_id
+        return Span(
+            trace_id=trace_id,
+            span_id=uuid4().hex[:16],
+            name=name,
+            kind=kind,
+            parent_id=parent.span_id if same_trace else None,
+            attributes=attributes,
+        )
+
+    def end(self, span: Optional[Span], error: Optional[BaseException] = None) -> None:
+        if span is None or span.duration is not None:
+            return
+        span.duration = time.perf_counter() - span._start
+        if error is not None:
+            span.status = "cancelled" if isinstance(error, asyncio.CancelledError) else "error"
+            span.error = f"{type(error).__name__}: {error}"
+        for collector in self.collectors:
+            collector.export(span)
+
+    def bind(self, owner: Any, span: Optional[Span]) -> None:
+        if span is not None:
+            self._bound[id(owner)] = span
+
+    def bound(self, owner: Any) -> Optional[Span]:
+        return self._bound.get(id(owner))
+
+    def unbind(self, owner: Any) -> Optional[Span]:
+        return self._bound.pop(id(owner), None)
+
+    @contextmanager
+    def span(
+        self, name: str, kind: str = "internal", parent: Optional[Span] = None, trace_id: Optional[str] = None, **attributes
+    ) -> Iterator[Optional[Span]]:
+        span = self.start(name, kind, parent=parent, trace_id=trace_id, **attributes)
+        if span is None:
+            yield None
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end(span, error=e)
+            raise
+        finally:
+            _current.reset(token)
+            self.end(span)
+
+    def close(self) -> None:
+        for collector in self.collectors:
+            if hasattr(collector, "close"):
+                collector.close()
+
+
+def traced(name: Optional[str] = None, kind: str = "tool"):
+    """
+    Decorator: run an agent tool (sync or async) in a span, nested under the
+    span bound to its run context (the agent holding the run), or else under
+    the current span. Goes under `@function_tool`.
+
+    Usage:
+        @function_tool
+        @traced()
+        async def compare_boms(wrapper: RunContextWrapper[ContextHook], ...):
+            ...
+    """
+
+    def decorator(func):
+        span_name = name or f"{kind}.{func.__name__}"
+
+        def parent(args) -> Optional[Span]:
+            owner = getattr(args[0], "context", None) if args else None
+            return tracer.bound(owner) if owner is not None else None
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name, kind=kind, parent=parent(args)):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            with tracer.span(span_name, kind=kind, parent=parent(args)):
+                return func(*args, **kwargs)
+
+        return sync_wrapper
+
+    return decorator
+
+
+def _build_tracer() -> Tracer:
+    collectors: List[Any] = [MemoryCollector(max_traces=settings.trace_max)]
+    if settings.trace_dir:
+        collectors.append(JSONLCollector(settings.trace_dir))
+    return Tracer(collectors, enabled=settings.tracing_enabled)
+
+
+tracer = _build_tracer()
@@ -78,7 +78,7 @@ def save_messages(messages: list, filename: str = None, folder: str = None, s3:
             try:
                 json_str = json.dumps(messages, indent=4, ensure_ascii=False)
                 # Tải nội dung JSON lên S3
-                s3.s3_client.put_object(
+                s3.client.put_object(
                     Body=json_str.encode("utf-8"),
                     Bucket=s3.bucket_name,
                     Key=filepath
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from spec.utils.cell_cache import CellCache, analyze_cell
+from spec.utils.notebook import Notebook
+
+BOM_df = pd.DataFrame(
+    {
+        "part_id": ["A", "A", "B"],
+        "child_part_id": ["B", "C", "D"],
+        "car_model": ["VF8", "VF9", "VF8"],
+        "released": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01"]),
+    }
+)
+
+READ_ONLY_CELLS = [
+    'BOM_df.groupby("car_model").size()',
+    'BOM_df.groupby("car_model").count()',
+    'BOM_df.groupby("car_model").first()',
+    'BOM_df.groupby("car_model").last()',
+    'BOM_df.groupby("car_model").nth(0)',
+    'len(BOM_df.to_dict("records"))',
+    'BOM_df["part_id"].to_list()',
+    "len(BOM_df)",
+    'BOM_df["child_part_id"].str.upper().str.startswith("B").sum()',
+    'BOM_df["released"].dt.year.value_counts()',
+    'BOM_df.drop(columns=["released"]).shape',
+]
+
+MUTATING_CELLS = [
+    'BOM_df["x"] = 1',
+    "BOM_df.loc[0, 'part_id'] = 'Z'",
+    'BOM_df.drop(columns=["released"], inplace=True)',
+    'BOM_df.attrs.update({"note": 1})',
+    'setattr(BOM_df, "flag", True)',
+    "del BOM_df['released']",
+]
+
+
+def _cache():
+    return CellCache({"BOM_df", "pd"}, modules={"pd"})
+
+
+def _run(code):
+    # A fresh copy per cell: the mutating cells must not change the module-level frame
+    return Notebook(env={"BOM_df": BOM_df.copy(), "pd": pd}).exec(code)
+
+
+@pytest.mark.parametrize("code", READ_ONLY_CELLS)
+def test_read_only_cells_hit_the_cache(code):
+    cache = _cache()
+    assert cache.put("s1", code, "v1", _run(code))
+    assert cache.get("s1", code, "v1") is not None
+    assert cache.get("s2", code, "v1") is not None
+    # The session can still use the cache for the shared frame afterwards
+    cache.put("s1", "BOM_df.shape", "v1", _run("BOM_df.shape"))
+    assert cache.get("s1", "BOM_df.shape", "v1") is not None
+
+
+@pytest.mark.parametrize("code", MUTATING_CELLS)
+def test_mutating_cells_taint_the_session(code):
+    cache = _cache()
+    cache.put("s1", "BOM_df.shape", "v1", _run("BOM_df.shape"))
+    cache.put("s1", code, "v1", _run(code))
+    assert cache.get("s1", "BOM_df.shape", "v1") is None
+    assert cache.get("s2", "BOM_df.shape", "v1") is not None
+
+
+def test_io_is_not_pure():
+    assert not analyze_cell('pd.read_csv("bom.csv")').pure
+    assert not analyze_cell('BOM_df.to_csv("out.csv")').pure
+
+
+def test_data_version_is_part_of_the_key():
+    cache = _cache()
+    cache.put("s1", "BOM_df.shape", "v1", _run("BOM_df.shape"))
+    assert cache.get("s1", "BOM_df.shape", "v2") is None